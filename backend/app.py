@@ -11,6 +11,13 @@ from routes.rides import rides_bp
 from routes.notifications import notifications_bp
 
 from routes.locations import locations_bp
+from scripts.database import get_pool_stats
+from utils.cache import get_cache_stats
+from services.email_service.email_outbox import email_outbox
+from services.email_service.smtp_pool import smtp_pool
+from services.notification_service import notification_broker
+from services.user_service.password_hasher import password_hasher
+from services.scheduler_service import job_scheduler
 
 load_dotenv()
 
@@ -25,9 +32,17 @@ CORS(app,
      origins=cors_origins, 
      supports_credentials=True,
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     allow_headers=['Content-Type', 'Authorization'])
+     allow_headers=['Content-Type', 'Authorization', 'Last-Event-ID', 'Idempotency-Key'])
 
 
+@app.before_request
+def start_background_jobs():
+    # Started lazily so each forked worker runs its own threads. The outbox
+    # starts here too, so messages left pending or awaiting a retry when the
+    # process restarted are delivered without waiting for a new email.
+    job_scheduler.start()
+    email_outbox.start()
+
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(rides_bp, url_prefix='/api/rides')
 app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
@@ -57,6 +72,55 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat() + 'Z'
     })
 
+@app.route('/api/health/database', methods=['GET'])
+def database_health_check():
+    """Connection pool statistics for monitoring"""
+    return jsonify({
+        'pool': get_pool_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+@app.route('/api/health/caches', methods=['GET'])
+def cache_health_check():
+    """In-process cache statistics for monitoring"""
+    return jsonify({
+        'caches': get_cache_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+@app.route('/api/health/email-outbox', methods=['GET'])
+def email_outbox_health_check():
+    """Email outbox queue depth by status for monitoring"""
+    return jsonify({
+        'outbox': email_outbox.get_stats(),
+        'smtpPool': smtp_pool.get_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+@app.route('/api/health/notification-stream', methods=['GET'])
+def notification_stream_health_check():
+    """Open SSE connections in this process for monitoring"""
+    return jsonify({
+        'stream': notification_broker.get_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+@app.route('/api/health/password-hasher', methods=['GET'])
+def password_hasher_health_check():
+    """bcrypt cost, shed requests and latency histograms for monitoring"""
+    return jsonify({
+        'hasher': password_hasher.get_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+@app.route('/api/health/scheduler', methods=['GET'])
+def scheduler_health_check():
+    """Scheduler leader and last run of each maintenance job for monitoring"""
+    return jsonify({
+        'scheduler': job_scheduler.get_stats(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
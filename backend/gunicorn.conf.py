@@ -0,0 +1,24 @@
+"""
+Gunicorn settings for production: gunicorn -c gunicorn.conf.py app:app
+
+Notification streams (GET /api/notifications/stream) hold a request open
+for up to SSE_MAX_STREAM_SECONDS. On sync workers every open stream would
+pin a whole worker process, so threaded (gthread) workers are required.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# The app sizes per-worker pools (password hashing) from the worker count
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 64))
+
+# Keep threads free for ordinary requests: streams beyond this get 503 + Retry-After
+os.environ.setdefault('SSE_MAX_CONNECTIONS', str(max(threads - int(os.getenv('GUNICORN_REQUEST_THREADS', 16)), 1)))
+
+def on_starting(server):
+    """Refuse to start on sync workers, where streams would starve every other request"""
+    if server.cfg.worker_class_str == 'sync' and server.cfg.threads <= 1:
+        raise RuntimeError('Notification streams need gthread or async (gevent/eventlet) workers; set GUNICORN_WORKER_CLASS or GUNICORN_THREADS')
@@ -1,10 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from datetime import datetime, timedelta
 import jwt
 import random
 import string
 from bson import ObjectId
 from services.user_service.user_service import user_service
+from services.user_service.password_hasher import PasswordHasherBusy
 from services.email_service.email_service import EmailService
 from utils.auth_helpers import create_jwt_token, verify_token
 
@@ -43,6 +44,8 @@ def register():
         
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Registration error: {str(e)}")  # Add debugging
         return jsonify({"error": "Registration failed"}), 500
@@ -68,6 +71,8 @@ def login():
             "token": token
         }), 200
         
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": "Login failed"}), 500
 
@@ -272,6 +277,8 @@ def reset_password():
             else:
                 return jsonify({"error": "The verification code is invalid or has expired. Please try again."}), 400
             
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Reset password error: {str(e)}")
         return jsonify({"error": "Failed to reset password"}), 500
@@ -298,9 +305,17 @@ def check_email():
         print(f"Check email error: {str(e)}")
         return jsonify({"error": "Failed to check email"}), 500
 
+def busy_response(error):
+    """429 for requests shed because the password hashing pool is saturated"""
+    response = jsonify({"error": "Too many requests, please try again shortly"})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
 def get_current_user():
-    """Get current user from request headers"""
-    return get_current_user_from_request(request)
+    """Get current user from request headers, memoized for the request's lifetime"""
+    if 'current_user' not in g:
+        g.current_user = get_current_user_from_request(request)
+    return dict(g.current_user) if g.current_user else None
 
 def get_current_user_from_request(request):
     """Extract user from request headers"""
@@ -312,7 +327,7 @@ def get_current_user_from_request(request):
     user_id = verify_token(token)
     
     if user_id:
-        return user_service.get_user_by_id(user_id)
+        return user_service.get_authenticated_user(user_id)
     return None
 
 def verify_token(token):
@@ -1,40 +1,140 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime
+import json
+import queue
+import time
 from bson import ObjectId
 from scripts.database import get_collection, format_object_id, format_object_id_list
 from routes.auth import get_current_user
+from utils.auth_helpers import create_stream_ticket, verify_stream_ticket, STREAM_TICKET_TTL_SECONDS
+from services.user_service.user_service import user_service
+from services.notification_service import (
+    get_user_notifications, DEFAULT_NOTIFICATIONS_LIMIT,
+    get_unread_count as get_user_unread_count,
+    mark_notification_as_read, mark_all_notifications_as_read,
+    notification_broker
+)
 
 notifications_bp = Blueprint('notifications', __name__)
 
+def format_notification(notif):
+    """Format a notification manually to handle ObjectId serialization"""
+    return {
+        '_id': str(notif['_id']),
+        'type': notif['type'],
+        'title': notif['title'], 
+        'message': notif['message'],
+        'read': notif.get('read', False),
+        'createdAt': notif['createdAt'].isoformat() + 'Z' if hasattr(notif['createdAt'], 'isoformat') else str(notif['createdAt']),
+        'relatedId': str(notif['relatedId']) if notif.get('relatedId') else None
+    }
+
 @notifications_bp.route('/', methods=['GET'])
 def get_notifications():
-    """Get all notifications for the current user"""
+    """Get a page of notifications for the current user
+    
+    Query params: limit (default 20, max 100), cursor (nextCursor from the
+    previous page) and unreadOnly=true.
+    """
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        notifications = get_collection('notifications')
-        user_notifications = list(notifications.find({'userId': ObjectId(user['_id'])}).sort('createdAt', -1))
-        
-        # Format notifications manually to handle ObjectId serialization
-        formatted_notifications = []
-        for notif in user_notifications:
-            formatted_notif = {
-                '_id': str(notif['_id']),
-                'type': notif['type'],
-                'title': notif['title'], 
-                'message': notif['message'],
-                'read': notif.get('read', False),
-                'createdAt': notif['createdAt'].isoformat() + 'Z' if hasattr(notif['createdAt'], 'isoformat') else str(notif['createdAt']),
-                'relatedId': str(notif['relatedId']) if notif.get('relatedId') else None
-            }
-            formatted_notifications.append(formatted_notif)
-        
-        return jsonify({'notifications': formatted_notifications}), 200
-        
+        limit = int(request.args.get('limit', DEFAULT_NOTIFICATIONS_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    try:
+        user_notifications, next_cursor = get_user_notifications(
+            user['_id'],
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            unread_only=request.args.get('unreadOnly', 'false').lower() == 'true'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to get notifications: {str(e)}'}), 400
+    
+    return jsonify({
+        'notifications': [format_notification(notif) for notif in user_notifications],
+        'nextCursor': next_cursor,
+        'hasMore': next_cursor is not None
+    }), 200
+
+@notifications_bp.route('/stream-ticket', methods=['POST'])
+def get_stream_ticket():
+    """Issue a short-lived ticket for opening the notification stream
+    
+    EventSource cannot set an Authorization header, so browsers pass this
+    ticket as ?ticket= instead of their session token. Request a new ticket
+    for every connection, including reconnects.
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'ticket': create_stream_ticket(user['_id']),
+        'expiresIn': STREAM_TICKET_TTL_SECONDS
+    }), 200
+
+@notifications_bp.route('/stream', methods=['GET'])
+def stream_notifications():
+    """Server-Sent Events stream of new notifications for the current user
+    
+    Authenticates with the Authorization header or a ?ticket= from
+    /stream-ticket. Each event's id is the notification id; clients send it
+    back as Last-Event-ID (or ?lastEventId=) on reconnect and missed
+    notifications are replayed. The stream ends after SSE_MAX_STREAM_SECONDS
+    and the client reconnects. Each open stream holds a worker thread, so
+    production servers must run the threaded workers in gunicorn.conf.py.
+    """
+    user = get_current_user()
+    if not user and request.args.get('ticket'):
+        user_id = verify_stream_ticket(request.args.get('ticket'))
+        user = user_service.get_authenticated_user(user_id) if user_id else None
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    user_id = str(user['_id'])
+    subscriber = notification_broker.subscribe(user_id)
+    if subscriber is None:
+        response = jsonify({'error': 'Too many open notification streams, try again later'})
+        response.headers['Retry-After'] = str(notification_broker.retry_ms // 1000)
+        return response, 503
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    
+    def event(notif):
+        return f"id: {notif['_id']}\nevent: notification\ndata: {json.dumps(format_notification(notif))}\n\n"
+    
+    def generate():
+        yield f"retry: {notification_broker.retry_ms}\n\n"
+        
+        # Notifications missed while disconnected; queued copies are skipped below
+        replayed = set()
+        if last_event_id:
+            for notif in notification_broker.replay_since(user_id, last_event_id):
+                replayed.add(notif['_id'])
+                yield event(notif)
+        
+        deadline = time.monotonic() + notification_broker.max_stream_seconds
+        while time.monotonic() < deadline:
+            try:
+                notif = subscriber.get(timeout=notification_broker.heartbeat_seconds)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if notif['_id'] not in replayed:
+                yield event(notif)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: notification_broker.unsubscribe(user_id, subscriber))
+    return response
 
 @notifications_bp.route('/unread-count', methods=['GET'])
 def get_unread_count():
@@ -44,11 +144,7 @@ def get_unread_count():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        notifications = get_collection('notifications')
-        unread_count = notifications.count_documents({
-            'userId': ObjectId(user['_id']),
-            'read': False
-        })
+        unread_count = get_user_unread_count(user['_id'])
         
         return jsonify({'unreadCount': unread_count}), 200
         
@@ -63,15 +159,7 @@ def mark_as_read(notification_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        notification_id = ObjectId(notification_id)
-        notifications = get_collection('notifications')
-        
-        result = notifications.update_one(
-            {'_id': notification_id, 'userId': ObjectId(user['_id'])},
-            {'$set': {'read': True}}
-        )
-        
-        if result.matched_count == 0:
+        if not mark_notification_as_read(notification_id, user['_id']):
             return jsonify({'error': 'Notification not found'}), 404
         
         return jsonify({'message': 'Notification marked as read'}), 200
@@ -87,14 +175,9 @@ def mark_all_as_read():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        notifications = get_collection('notifications')
-        
-        result = notifications.update_many(
-            {'userId': ObjectId(user['_id']), 'read': False},
-            {'$set': {'read': True}}
-        )
+        modified_count = mark_all_notifications_as_read(user['_id'])
         
-        return jsonify({'message': f'Marked {result.modified_count} notifications as read'}), 200
+        return jsonify({'message': f'Marked {modified_count} notifications as read'}), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to mark notifications as read: {str(e)}'}), 400
\ No newline at end of file
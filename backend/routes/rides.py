@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from scripts.database import get_collection, format_object_id, format_object_id_list
 from routes.auth import get_current_user
-from services.ride_service import search_rides_with_scoring, get_ride_with_details
+from utils.idempotency import idempotent
+from services.ride_service import search_rides_page, get_ride_with_details, hydrate_rides, get_departure_minutes, get_route_keys, list_active_rides, ride_search_cache, reserve_seat, release_seat, update_ride_versioned, RideVersionConflict
 from services.notification_service import create_ride_interest_notification, create_ride_interest_removed_notification, create_ride_update_notification, create_ride_cancellation_notifications
 
 rides_bp = Blueprint('rides', __name__)
@@ -43,68 +45,79 @@ def search_rides():
             'preferredEndTime': preferred_time_end
         }
         
+        # Pagination
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 10))
+        
         # Pass user ID to exclude rides user has already expressed interest in
         user_id = current_user['_id'] if current_user else None
-        scored_rides = search_rides_with_scoring(search_criteria, user_id)
+        paginated_rides, total = search_rides_page(search_criteria, user_id, page, per_page)
         
-        if not scored_rides:
+        if not total:
             return jsonify({
                 'rides': [],
                 'total': 0,
                 'message': 'No rides found for your criteria'
             }), 200
         
-        # Pagination
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        
-        paginated_rides = scored_rides[start_idx:end_idx]
-        
-        # Format rides for response
-        formatted_rides = []
-        for ride in paginated_rides:
-            ride_with_details = get_ride_with_details(ride['_id'])
-            if ride_with_details:
-                formatted_ride = format_object_id(ride_with_details)
-                formatted_rides.append(formatted_ride)
+        # Format rides for response - drivers for the whole page in one query
+        formatted_rides = hydrate_rides(paginated_rides)
         
         return jsonify({
             'rides': formatted_rides,
-            'total': len(scored_rides),
+            'total': total,
             'page': page,
             'per_page': per_page,
-            'total_pages': (len(scored_rides) + per_page - 1) // per_page
+            'total_pages': (total + per_page - 1) // per_page
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Search failed: {str(e)}'}), 400
 
 @rides_bp.route('/', methods=['GET', 'POST'])
+@idempotent(scope=lambda: (get_current_user() or {}).get('_id'))
 def rides():
     """Get all rides or create a new ride posting"""
     if request.method == 'GET':
-        """Get all rides"""
+        """Get a page of active rides
+        
+        Query params: limit (default 20, max 100), cursor (nextCursor from
+        the previous page), travelDateFrom / travelDateTo (YYYY-MM-DD),
+        startingFrom, goingTo and fields (comma-separated subset).
+        """
         user = get_current_user()
         if not user:
             return jsonify({'error': 'Unauthorized'}), 401
         
         try:
-            ride_posts = get_collection('ride_posts')
-            rides = list(ride_posts.find({'status': 'active'}).sort('createdAt', -1))
+            filters = {}
+            for key in ('travelDateFrom', 'travelDateTo'):
+                if request.args.get(key):
+                    filters[key] = datetime.strptime(request.args[key], '%Y-%m-%d').strftime('%Y-%m-%d')
+            for key in ('startingFrom', 'goingTo'):
+                if request.args.get(key):
+                    filters[key] = request.args[key]
+            fields = request.args['fields'].split(',') if request.args.get('fields') else None
+            
+            rides, next_cursor = list_active_rides(
+                filters,
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit'),
+                fields=fields
+            )
             
             # Format rides for response
-            formatted_rides = []
-            for ride in rides:
-                formatted_ride = format_object_id(ride)
-                formatted_rides.append(formatted_ride)
+            formatted_rides = format_object_id_list(rides)
             
             return jsonify({
                 'rides': formatted_rides,
-                'total': len(formatted_rides)
+                'count': len(formatted_rides),
+                'nextCursor': next_cursor,
+                'hasMore': next_cursor is not None
             }), 200
             
+        except ValueError as e:
+            return jsonify({'error': f'Invalid query parameter: {str(e)}'}), 400
         except Exception as e:
             return jsonify({'error': f'Failed to get rides: {str(e)}'}), 500
     
@@ -127,15 +140,20 @@ def rides():
                 'departureEndTime': data['departureEndTime'],
                 'availableSeats': data['availableSeats'],
                 'seatsRemaining': data['availableSeats'],
+                'interestCount': 0,
+                'version': 1,
                 'suggestedContribution': data.get('suggestedContribution', 0),
                 'additionalDetails': data.get('additionalDetails', ''),
                 'status': 'active',
                 'createdAt': datetime.utcnow(),
                 'updatedAt': datetime.utcnow()
             }
+            ride_data.update(get_departure_minutes(ride_data))
+            ride_data.update(get_route_keys(ride_data))
             
             ride_posts = get_collection('ride_posts')
             result = ride_posts.insert_one(ride_data)
+            ride_search_cache.invalidate_ride(ride_data)
             
             # Get the created ride with proper formatting
             created_ride = ride_posts.find_one({'_id': result.inserted_id})
@@ -149,6 +167,7 @@ def rides():
             return jsonify({'error': f'Failed to create ride: {str(e)}'}), 400
 
 @rides_bp.route('/<ride_id>/interest', methods=['POST'])
+@idempotent(scope=lambda: (get_current_user() or {}).get('_id'))
 def express_interest(ride_id):
     """Express interest in a ride with notification"""
     user = get_current_user()
@@ -157,52 +176,43 @@ def express_interest(ride_id):
     
     try:
         ride_id = ObjectId(ride_id)
-        
-        # Get ride and provider info in one query using aggregation
+        user_object_id = ObjectId(user['_id'])
         ride_posts = get_collection('ride_posts')
-        
-        # Use aggregation to get ride and provider info in one query
-        pipeline = [
-            {'$match': {'_id': ride_id, 'status': 'active'}},
-            {'$lookup': {
-                'from': 'users',
-                'localField': 'userId',
-                'foreignField': '_id',
-                'as': 'provider'
-            }},
-            {'$unwind': '$provider'}
-        ]
-        
-        ride_with_provider = list(ride_posts.aggregate(pipeline))
-        
-        if not ride_with_provider:
-            return jsonify({'error': 'Ride not found'}), 404
-        
-        ride_data = ride_with_provider[0]
-        provider_data = ride_data['provider']
-        
-        # Check if user is trying to express interest in their own ride
-        if str(ride_data['userId']) == str(user['_id']):
-            return jsonify({'error': 'You cannot express interest in your own ride'}), 400
-        
-        # Check if already interested
         ride_interests = get_collection('ride_interests')
-        existing_interest = ride_interests.find_one({
-            'rideId': ride_id,
-            'interestedUserId': ObjectId(user['_id'])
-        })
         
-        if existing_interest:
+        # The unique (rideId, interestedUserId) index rejects duplicates in the same round trip
+        try:
+            interest_id = ride_interests.insert_one({
+                'rideId': ride_id,
+                'interestedUserId': user_object_id,
+                'status': 'interested',
+                'createdAt': datetime.utcnow()
+            }).inserted_id
+        except DuplicateKeyError:
             return jsonify({'error': 'Already expressed interest'}), 400
         
-        # Create interest record
-        interest_data = {
-            'rideId': ride_id,
-            'interestedUserId': ObjectId(user['_id']),
-            'status': 'interested',
-            'createdAt': datetime.utcnow()
-        }
-        ride_interests.insert_one(interest_data)
+        # Take a seat atomically; only the failure path needs another read
+        try:
+            ride_data = reserve_seat(ride_id, user_object_id)
+            ride = None if ride_data else ride_posts.find_one({'_id': ride_id}, {'status': 1, 'userId': 1})
+        except Exception:
+            # An interest without a seat would block retries and be counted by reconciliation
+            ride_interests.delete_one({'_id': interest_id})
+            raise
+        
+        if ride_data is None:
+            ride_interests.delete_one({'_id': interest_id})
+            if not ride or ride.get('status') != 'active':
+                return jsonify({'error': 'Ride not found'}), 404
+            if ride['userId'] == user_object_id:
+                return jsonify({'error': 'You cannot express interest in your own ride'}), 400
+            return jsonify({'error': 'No seats remaining on this ride'}), 409
+        
+        ride_search_cache.invalidate_ride(ride_data)
+        
+        provider_data = get_collection('users').find_one(
+            {'_id': ride_data['userId']}, {'name': 1, 'phone': 1, 'whatsapp': 1}
+        ) or {}
         
         # Send notification to ride provider
         create_ride_interest_notification(ride_id, user['_id'], ride_data)
@@ -211,7 +221,7 @@ def express_interest(ride_id):
         return jsonify({
             'message': 'Interest expressed successfully',
             'rideProvider': {
-                'name': provider_data['name'],
+                'name': provider_data.get('name', ''),
                 'phoneNumber': provider_data.get('phone', ''),  # Database stores as 'phone'
                 'whatsappNumber': provider_data.get('whatsapp', '')  # Database stores as 'whatsapp'
             }
@@ -237,25 +247,19 @@ def remove_interest(ride_id):
         if not ride:
             return jsonify({'error': 'Ride not found'}), 404
         
-        # Check if user has expressed interest
+        # Remove the interest record; nothing deleted means there was no interest
         ride_interests = get_collection('ride_interests')
-        existing_interest = ride_interests.find_one({
+        result = ride_interests.delete_one({
             'rideId': ride_id,
             'interestedUserId': ObjectId(user['_id']),
             'status': 'interested'
         })
         
-        if not existing_interest:
+        if result.deleted_count == 0:
             return jsonify({'error': 'You have not expressed interest in this ride'}), 400
         
-        # Remove the interest record
-        result = ride_interests.delete_one({
-            'rideId': ride_id,
-            'interestedUserId': ObjectId(user['_id'])
-        })
-        
-        if result.deleted_count == 0:
-            return jsonify({'error': 'Failed to remove interest'}), 400
+        release_seat(ride_id)
+        ride_search_cache.invalidate_ride(ride)
         
         # Send notification to ride owner
         create_ride_interest_removed_notification(ride_id, user['_id'], ride)
@@ -408,14 +412,15 @@ def get_my_rides():
         
         rides = list(ride_posts.find(query).sort('createdAt', -1))
         
+        # Finished rides older than RIDE_ARCHIVE_AFTER_DAYS live in the archive
+        if status_filter != 'active':
+            archived = get_collection('ride_posts_archive').find(query).sort('createdAt', -1)
+            rides = sorted(rides + list(archived), key=lambda ride: ride['createdAt'], reverse=True)
+        
         formatted_rides = []
         for ride in rides:
-            # Get interest count
-            ride_interests = get_collection('ride_interests')
-            interest_count = ride_interests.count_documents({'rideId': ride['_id']})
-            
             formatted_ride = format_object_id(ride)
-            formatted_ride['interestCount'] = interest_count
+            formatted_ride.setdefault('interestCount', 0)
             formatted_rides.append(formatted_ride)
         
         return jsonify({'rides': formatted_rides}), 200
@@ -458,9 +463,7 @@ def update_ride(ride_id):
         ride_id = ObjectId(ride_id)
         data = request.get_json()
         
-        # Update ride directly - frontend already validated ownership
-        ride_posts = get_collection('ride_posts')
-        
+        # Ownership is enforced by the versioned update's filter
         # Update ride
         update_data = {
             'updatedAt': datetime.utcnow()
@@ -476,6 +479,8 @@ def update_ride(ride_id):
             update_data['departureStartTime'] = data['departureStartTime']
         if 'departureEndTime' in data:
             update_data['departureEndTime'] = data['departureEndTime']
+        update_data.update(get_departure_minutes(update_data))
+        update_data.update(get_route_keys(update_data))
         if 'availableSeats' in data:
             update_data['availableSeats'] = data['availableSeats']
         if 'suggestedContribution' in data:
@@ -483,22 +488,25 @@ def update_ride(ride_id):
         if 'additionalDetails' in data:
             update_data['additionalDetails'] = data['additionalDetails']
         
-        result = ride_posts.update_one(
-            {'_id': ride_id, 'userId': ObjectId(user['_id'])}, 
-            {'$set': update_data}
+        previous_ride, updated_ride = update_ride_versioned(
+            ride_id, ObjectId(user['_id']), update_data, expected_version=data.get('version')
         )
         
-        if result.matched_count == 0:
+        if previous_ride is None:
             return jsonify({'error': 'Ride not found or not owned by user'}), 404
         
-        # Get the updated ride for notification
-        updated_ride = ride_posts.find_one({'_id': ride_id})
+        # Searches on both the old and the new route may have included this ride
+        ride_search_cache.invalidate_ride(previous_ride, updated_ride)
         
         # Notify interested users
         create_ride_update_notification(ride_id, updated_ride)
         
-        return jsonify({'message': 'Ride updated successfully'}), 200
+        return jsonify({'message': 'Ride updated successfully', 'version': updated_ride['version']}), 200
         
+    except RideVersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Update ride error: {str(e)}")  # Debug logging
         import traceback
@@ -527,6 +535,7 @@ def delete_ride(ride_id):
         
         # Delete ride and related interests in one operation
         ride_posts.delete_one({'_id': ride_id})
+        ride_search_cache.invalidate_ride(ride)
         ride_interests = get_collection('ride_interests')
         ride_interests.delete_many({'rideId': ride_id})
         
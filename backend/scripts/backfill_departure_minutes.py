@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Backfill minute-of-day departure fields on ride posts
+- Finds rides without departureStartMinutes/departureEndMinutes
+- Derives them from the "HH:MM" departure time strings
+"""
+
+import sys
+import traceback
+
+from services.ride_service.ride_matching import backfill_departure_minutes
+
+def main():
+    """Write minute-of-day fields on rides created before they existed"""
+    try:
+        print("🔄 Backfilling departure minute fields...")
+        updated = backfill_departure_minutes()
+        print(f"✅ Updated {updated} ride(s)")
+    except Exception as e:
+        print(f"❌ Error backfilling departure minutes: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
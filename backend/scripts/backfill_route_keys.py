@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Backfill canonical route keys on ride posts
+- Finds rides without originCityKey/destinationCityKey (or every ride with --all)
+- Resolves them (and ZIP codes) from the startingFrom/goingTo strings
+"""
+
+import argparse
+import sys
+import traceback
+
+from services.ride_service.ride_matching import backfill_route_keys
+
+def main():
+    """Write route keys on rides created before they existed"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--all', action='store_true', help='re-resolve keys on rides that already have them')
+    args = parser.parse_args()
+
+    try:
+        print("🔄 Backfilling ride route keys...")
+        updated = backfill_route_keys(recompute=args.all)
+        print(f"✅ Updated {updated} ride(s)")
+    except Exception as e:
+        print(f"❌ Error backfilling route keys: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
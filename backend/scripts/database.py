@@ -1,32 +1,200 @@
 import os
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import MongoClient, ReadPreference, monitoring
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+DATABASE_NAME = 'campus-share'
+
+READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST
+}
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collect connection pool statistics for monitoring"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections_open = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.pool_clears = 0
+
+    def _record_wait(self):
+        started = getattr(self._local, 'checkout_started', None)
+        self._local.checkout_started = None
+        if started is None:
+            return 0.0
+        return (time.perf_counter() - started) * 1000
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open = max(0, self.connections_open - 1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        wait_ms = self._record_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connectionsOpen': self.connections_open,
+                'checkedOut': self.checked_out,
+                'checkouts': self.checkouts,
+                'checkoutFailures': self.checkout_failures,
+                'avgWaitMs': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'maxWaitMs': round(self.max_wait_ms, 3),
+                'poolClears': self.pool_clears
+            }
+
+class ConnectionManager:
+    """Process-wide MongoClient registry.
+
+    A single client is created lazily on first use and re-created when the
+    process id changes, so each gunicorn worker builds its own client after
+    forking instead of inheriting the master's sockets and monitor threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self.pool_stats = PoolStatsListener()
+
+    def _client_options(self):
+        """Build MongoClient options from environment variables"""
+        read_preference = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+        if read_preference not in READ_PREFERENCES:
+            print(f"Unknown MONGO_READ_PREFERENCE '{read_preference}', falling back to primary")
+            read_preference = 'primary'
+
+        return {
+            'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+            'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+            'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000)),
+            'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+            'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)),
+            'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000)),
+            'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+            'read_preference': READ_PREFERENCES[read_preference],
+            'event_listeners': [self.pool_stats],
+            'connect': False
+        }
+
+    def get_client(self):
+        """Get the MongoClient for the current process, creating it if needed"""
+        pid = os.getpid()
+        if self._client is not None and self._pid == pid:
+            return self._client
+
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                if self._client is not None:
+                    # Inherited from the parent process - drop it without
+                    # touching the parent's sockets
+                    self._client = None
+                    self.pool_stats.reset()
+                self._client = MongoClient(os.getenv('MONGODB_URI'), **self._client_options())
+                self._pid = pid
+            return self._client
+
+    def close(self):
+        """Close the current process's client"""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def get_stats(self):
+        """Get connection pool statistics for monitoring"""
+        stats = self.pool_stats.snapshot()
+        stats['pid'] = os.getpid()
+        stats['clientActive'] = self._client is not None and self._pid == os.getpid()
+        stats['maxPoolSize'] = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+        return stats
+
+# Global instance
+connection_manager = ConnectionManager()
+
+def get_client():
+    """Get the process-wide MongoDB client"""
+    return connection_manager.get_client()
+
 def get_db():
     """Get MongoDB database instance"""
-    client = MongoClient(os.getenv('MONGODB_URI'))
-    return client['campus-share']
+    return get_client()[DATABASE_NAME]
 
 def get_collection(collection_name):
     """Get MongoDB collection instance"""
     db = get_db()
     return db[collection_name]
 
+def get_pool_stats():
+    """Get connection pool statistics for monitoring"""
+    return connection_manager.get_stats()
+
 def format_object_id(obj):
     """Convert ObjectId to string for JSON serialization"""
     if obj and '_id' in obj:
         obj['_id'] = str(obj['_id'])
-    
+
     if obj and 'userId' in obj:
         obj['userId'] = str(obj['userId'])
-    
+
     return obj
 
 def format_object_id_list(obj_list):
     """Convert ObjectIds to strings for a list of objects"""
-    return [format_object_id(obj) for obj in obj_list] 
-
- 
\ No newline at end of file
+    return [format_object_id(obj) for obj in obj_list]
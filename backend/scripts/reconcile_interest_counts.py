@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Reconcile denormalized ride interest counters
+- Recounts ride_interests per ride
+- Repairs ride_posts.interestCount wherever it has drifted
+- Resets seatsRemaining to availableSeats minus the interests holding seats
+"""
+
+import sys
+import traceback
+
+from services.ride_service.ride_matching import reconcile_interest_counts
+
+def main():
+    """Recount interests and repair drifted counters"""
+    try:
+        print("🔄 Reconciling ride interest counts...")
+        repaired = reconcile_interest_counts()
+        print(f"✅ Repaired {repaired} ride(s)")
+    except Exception as e:
+        print(f"❌ Error reconciling interest counts: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
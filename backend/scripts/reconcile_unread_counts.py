@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Reconcile materialized unread-notification counters
+- Recounts unread notifications per user
+- Repairs notification_counters.unread wherever it has drifted
+- Creates missing counters (run once after deploying the counters)
+"""
+
+import sys
+import traceback
+
+from services.notification_service import reconcile_unread_counts
+
+def main():
+    """Recount unread notifications and repair drifted counters"""
+    try:
+        print("🔄 Reconciling unread notification counts...")
+        repaired = reconcile_unread_counts()
+        print(f"✅ Repaired {repaired} counter(s)")
+    except Exception as e:
+        print(f"❌ Error reconciling unread counts: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Run scheduled maintenance jobs once, outside the in-process scheduler
+- Completes rides whose travel date has passed
+- Moves finished rides and their interests into the archive collections
+- Deletes old read notifications
+- Repairs drifted unread-notification and ride interest counters
+Pass job names to run only those, e.g. `python3 -m scripts.run_scheduled_jobs expire_past_rides`
+"""
+
+import sys
+import traceback
+
+from services.scheduler_service import job_scheduler
+
+def main():
+    """Run the requested (or all) scheduled jobs now"""
+    names = sys.argv[1:] or list(job_scheduler.jobs)
+    unknown = [name for name in names if name not in job_scheduler.jobs]
+    if unknown:
+        print(f"❌ Unknown job(s): {', '.join(unknown)}. Available: {', '.join(job_scheduler.jobs)}")
+        sys.exit(1)
+
+    try:
+        for name in names:
+            print(f"🔄 Running {name}...")
+            result = job_scheduler.run_job(name)
+            print(f"✅ {name}: {result}")
+    except Exception as e:
+        print(f"❌ Error running scheduled jobs: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
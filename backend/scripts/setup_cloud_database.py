@@ -13,6 +13,7 @@ import pandas as pd
 from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, GEOSPHERE
 from pymongo.errors import OperationFailure, DuplicateKeyError
 from datetime import datetime
+from bson import ObjectId
 import traceback
 
 # MODIFY THIS CONNECTION STRING FOR YOUR CLOUD DATABASE
@@ -185,6 +186,17 @@ def create_locations_collection(db):
         if "already exists" not in str(e):
             print(f"⚠️  Locations index warning: {e}")
 
+# Bookable rides; mirrors HOT_RIDES_FILTER in services/ride_service/ride_matching.py
+HOT_RIDES_FILTER = {"status": "active", "seatsRemaining": {"$gt": 0}}
+
+# Indexes over every ride, replaced by partial indexes on HOT_RIDES_FILTER
+SUPERSEDED_RIDE_POST_INDEXES = [
+    "travel_date_idx", "starting_from_idx", "going_to_idx", "status_idx",
+    "created_at_desc_idx", "status_date_seats_idx", "origin_date_idx",
+    "destination_date_idx", "seats_remaining_idx", "status_date_departure_idx",
+    "status_departure_idx", "route_date_status_idx", "status_created_id_idx"
+]
+
 def create_ride_posts_collection(db):
     """Create ride_posts collection with indexes"""
     print("\n🚗 Setting up Ride Posts collection...")
@@ -192,67 +204,82 @@ def create_ride_posts_collection(db):
     ride_posts = db.ride_posts
     
     try:
+        # Drop full-collection indexes from earlier setups
+        existing_indexes = {index["name"] for index in ride_posts.list_indexes()}
+        for index_name in SUPERSEDED_RIDE_POST_INDEXES:
+            if index_name in existing_indexes:
+                ride_posts.drop_index(index_name)
+                print(f"🗑️  Dropped superseded index {index_name}")
+        
         # User-related indexes
         ride_posts.create_index([("userId", ASCENDING)], name="user_id_idx")
         print("✅ Created index on userId")
         
-        # Search-critical indexes
-        ride_posts.create_index([("travelDate", ASCENDING)], name="travel_date_idx")
-        print("✅ Created index on travelDate")
-        
-        ride_posts.create_index([("startingFrom", ASCENDING)], name="starting_from_idx")
-        print("✅ Created index on startingFrom")
-        
-        ride_posts.create_index([("goingTo", ASCENDING)], name="going_to_idx")
-        print("✅ Created index on goingTo")
-        
-        ride_posts.create_index([("status", ASCENDING)], name="status_idx")
-        print("✅ Created index on status")
-        
-        ride_posts.create_index([("createdAt", DESCENDING)], name="created_at_desc_idx")
-        print("✅ Created index on createdAt (descending)")
+        ride_posts.create_index([
+            ("userId", ASCENDING),
+            ("status", ASCENDING)
+        ], name="user_status_idx")
+        print("✅ Created compound index on userId+status")
         
-        # Compound indexes for optimal search performance
+        # Maintenance jobs: completing past rides and archiving finished ones
         ride_posts.create_index([
             ("status", ASCENDING),
             ("travelDate", ASCENDING)
         ], name="status_date_idx")
         print("✅ Created compound index on status+travelDate")
         
+        # Search and listing indexes only cover bookable rides, so they stay
+        # proportional to upcoming rides rather than the ride history
         ride_posts.create_index([
-            ("status", ASCENDING),
-            ("travelDate", ASCENDING),
-            ("seatsRemaining", ASCENDING)
-        ], name="status_date_seats_idx")
-        print("✅ Created compound index on status+travelDate+seatsRemaining")
+            ("originCityKey", ASCENDING),
+            ("destinationCityKey", ASCENDING),
+            ("travelDate", ASCENDING)
+        ], name="active_route_date_idx", partialFilterExpression=HOT_RIDES_FILTER)
+        print("✅ Created partial index on originCityKey+destinationCityKey+travelDate (bookable rides)")
         
+        # Departure window indexes for server-side time overlap filtering
         ride_posts.create_index([
-            ("userId", ASCENDING),
-            ("status", ASCENDING)
-        ], name="user_status_idx")
-        print("✅ Created compound index on userId+status")
+            ("travelDate", ASCENDING),
+            ("departureStartMinutes", ASCENDING),
+            ("departureEndMinutes", ASCENDING)
+        ], name="active_date_departure_idx", partialFilterExpression=HOT_RIDES_FILTER)
+        print("✅ Created partial index on travelDate+departureStartMinutes+departureEndMinutes (bookable rides)")
         
-        # Location-based compound indexes
         ride_posts.create_index([
-            ("startingFrom", ASCENDING),
-            ("travelDate", ASCENDING)
-        ], name="origin_date_idx")
-        print("✅ Created compound index on startingFrom+travelDate")
+            ("departureStartMinutes", ASCENDING),
+            ("departureEndMinutes", ASCENDING)
+        ], name="active_departure_idx", partialFilterExpression=HOT_RIDES_FILTER)
+        print("✅ Created partial index on departureStartMinutes+departureEndMinutes (bookable rides)")
         
+        # Keyset pagination of the ride listing
         ride_posts.create_index([
-            ("goingTo", ASCENDING),
-            ("travelDate", ASCENDING)
-        ], name="destination_date_idx")
-        print("✅ Created compound index on goingTo+travelDate")
-        
-        # Seats availability index
-        ride_posts.create_index([("seatsRemaining", ASCENDING)], name="seats_remaining_idx")
-        print("✅ Created index on seatsRemaining")
+            ("createdAt", DESCENDING),
+            ("_id", DESCENDING)
+        ], name="active_created_id_idx", partialFilterExpression=HOT_RIDES_FILTER)
+        print("✅ Created partial index on createdAt+_id (bookable rides)")
         
     except OperationFailure as e:
         if "already exists" not in str(e):
             print(f"⚠️  Ride posts index warning: {e}")
 
+def create_ride_posts_archive_collection(db):
+    """Create ride_posts_archive collection with indexes"""
+    print("\n🗄️  Setting up Ride Posts Archive collection...")
+    
+    archive = db.ride_posts_archive
+    
+    try:
+        # A user's ride history (my-rides)
+        archive.create_index([
+            ("userId", ASCENDING),
+            ("createdAt", DESCENDING)
+        ], name="user_created_idx")
+        print("✅ Created compound index on userId+createdAt")
+        
+    except OperationFailure as e:
+        if "already exists" not in str(e):
+            print(f"⚠️  Ride posts archive index warning: {e}")
+
 def create_ride_interests_collection(db):
     """Create ride_interests collection with indexes"""
     print("\n💝 Setting up Ride Interests collection...")
@@ -331,6 +358,21 @@ def create_notifications_collection(db):
         ], name="user_created_idx")
         print("✅ Created compound index on userId+createdAt")
         
+        # Keyset pagination: (createdAt, _id) is a unique, stable sort order
+        notifications.create_index([
+            ("userId", ASCENDING),
+            ("createdAt", DESCENDING),
+            ("_id", DESCENDING)
+        ], name="user_created_id_idx")
+        print("✅ Created compound index on userId+createdAt+_id")
+        
+        # Scheduled prune of old read notifications
+        notifications.create_index([
+            ("read", ASCENDING),
+            ("createdAt", ASCENDING)
+        ], name="read_created_idx")
+        print("✅ Created compound index on read+createdAt")
+        
         notifications.create_index([
             ("userId", ASCENDING),
             ("read", ASCENDING),
@@ -346,6 +388,98 @@ def create_notifications_collection(db):
         if "already exists" not in str(e):
             print(f"⚠️  Notifications index warning: {e}")
 
+def create_email_outbox_collection(db):
+    """Create email_outbox collection with indexes"""
+    print("\n📧 Setting up Email Outbox collection...")
+    
+    email_outbox = db.email_outbox
+    
+    try:
+        # Worker claim query: due pending messages and stale in-flight ones
+        email_outbox.create_index([
+            ("status", ASCENDING),
+            ("nextAttemptAt", ASCENDING)
+        ], name="status_next_attempt_idx")
+        print("✅ Created compound index on status+nextAttemptAt")
+        
+        email_outbox.create_index([
+            ("status", ASCENDING),
+            ("lockedAt", ASCENDING)
+        ], name="status_locked_at_idx")
+        print("✅ Created compound index on status+lockedAt")
+        
+        # Delivered messages expire after 7 days
+        email_outbox.create_index(
+            [("sentAt", ASCENDING)],
+            expireAfterSeconds=7 * 24 * 60 * 60,
+            name="sent_at_ttl_idx"
+        )
+        print("✅ Created TTL index on sentAt (7 days)")
+        
+    except OperationFailure as e:
+        if "already exists" not in str(e):
+            print(f"⚠️  Email outbox index warning: {e}")
+
+def create_ride_interests_archive_collection(db):
+    """Create ride_interests_archive collection with indexes"""
+    print("\n🗄️  Setting up Ride Interests Archive collection...")
+    
+    archive = db.ride_interests_archive
+    
+    try:
+        archive.create_index([("rideId", ASCENDING)], name="ride_id_idx")
+        print("✅ Created index on rideId")
+        
+        archive.create_index([("interestedUserId", ASCENDING)], name="interested_user_idx")
+        print("✅ Created index on interestedUserId")
+        
+    except OperationFailure as e:
+        if "already exists" not in str(e):
+            print(f"⚠️  Ride interests archive index warning: {e}")
+
+def create_idempotency_keys_collection(db):
+    """Create idempotency_keys collection with its expiry index"""
+    print("\n🔁 Setting up Idempotency Keys collection...")
+    
+    idempotency_keys = db.idempotency_keys
+    
+    try:
+        # Stored responses and abandoned claims are removed once expiresAt passes
+        idempotency_keys.create_index(
+            [("expiresAt", ASCENDING)],
+            expireAfterSeconds=0,
+            name="expires_at_ttl_idx"
+        )
+        print("✅ Created TTL index on expiresAt")
+        
+    except OperationFailure as e:
+        if "already exists" not in str(e):
+            print(f"⚠️  Idempotency keys index warning: {e}")
+
+def create_ride_search_generations_collection(db):
+    """Create ride_search_generations collection with its expiry index"""
+    print("\n🔢 Setting up Ride Search Generations collection...")
+    
+    generations = db.ride_search_generations
+    
+    try:
+        # A route left untouched for a day has no cached searches left to invalidate
+        generations.create_index(
+            [("updatedAt", ASCENDING)],
+            expireAfterSeconds=24 * 60 * 60,
+            name="updated_at_ttl_idx"
+        )
+        print("✅ Created TTL index on updatedAt (1 day)")
+        
+    except OperationFailure as e:
+        if "already exists" not in str(e):
+            print(f"⚠️  Ride search generations index warning: {e}")
+
+# Mirrors location_object_id in services/location_service/gazetteer.py, so the
+# gazetteer's CSV fallback hands out the same ids as the loaded collection
+def location_object_id(zip_code):
+    return ObjectId(str(zip_code).zfill(24))
+
 def load_locations_from_csv(db, csv_file_path='data/locations.csv'):
     """Load locations from CSV file into cloud database"""
     try:
@@ -417,7 +551,7 @@ def load_locations_from_csv(db, csv_file_path='data/locations.csv'):
                         operations = [
                             UpdateOne(
                                 {'zipCode': loc['zipCode']},
-                                {'$set': loc},
+                                {'$set': loc, '$setOnInsert': {'_id': location_object_id(loc['zipCode'])}},
                                 upsert=True
                             ) for loc in batch_data
                         ]
@@ -435,7 +569,7 @@ def load_locations_from_csv(db, csv_file_path='data/locations.csv'):
                             try:
                                 locations.update_one(
                                     {'zipCode': loc['zipCode']},
-                                    {'$set': loc},
+                                    {'$set': loc, '$setOnInsert': {'_id': location_object_id(loc['zipCode'])}},
                                     upsert=True
                                 )
                                 count += 1
@@ -455,7 +589,7 @@ def load_locations_from_csv(db, csv_file_path='data/locations.csv'):
                 operations = [
                     UpdateOne(
                         {'zipCode': loc['zipCode']},
-                        {'$set': loc},
+                        {'$set': loc, '$setOnInsert': {'_id': location_object_id(loc['zipCode'])}},
                         upsert=True
                     ) for loc in batch_data
                 ]
@@ -469,7 +603,7 @@ def load_locations_from_csv(db, csv_file_path='data/locations.csv'):
                     try:
                         locations.update_one(
                             {'zipCode': loc['zipCode']},
-                            {'$set': loc},
+                            {'$set': loc, '$setOnInsert': {'_id': location_object_id(loc['zipCode'])}},
                             upsert=True
                         )
                         count += 1
@@ -495,7 +629,7 @@ def verify_database_setup(db):
     """Verify that database setup is complete and functional"""
     print("\n🔍 Verifying database setup...")
     
-    collections = ['users', 'locations', 'ride_posts', 'ride_interests', 'notifications']
+    collections = ['users', 'locations', 'ride_posts', 'ride_interests', 'notifications', 'email_outbox', 'idempotency_keys', 'ride_interests_archive', 'ride_posts_archive', 'ride_search_generations']
     
     for collection_name in collections:
         collection = db[collection_name]
@@ -531,9 +665,10 @@ def get_database_performance_tips():
     print("✅ Text search enabled for location autocomplete")
     print("✅ Unique constraints prevent data duplication")
     print("\n💡 Query Performance Guidelines:")
-    print("• Always filter by status='active' for ride searches")
+    print("• Ride searches must filter status='active' AND seatsRemaining > 0 to use the partial indexes")
     print("• Use travelDate in queries for better performance")
-    print("• Compound queries (status+date+location) are optimized")
+    print("• Route queries (originCityKey+destinationCityKey+date) are optimized")
+    print("• Finished rides are moved to ride_posts_archive by the scheduler")
     print("• Location text search supports autocomplete features")
     print("• User-specific queries (userId) are well-indexed")
     print("\n📊 Monitoring:")
@@ -574,6 +709,11 @@ def main():
         create_ride_posts_collection(db)
         create_ride_interests_collection(db)
         create_notifications_collection(db)
+        create_email_outbox_collection(db)
+        create_idempotency_keys_collection(db)
+        create_ride_interests_archive_collection(db)
+        create_ride_posts_archive_collection(db)
+        create_ride_search_generations_collection(db)
         
         # Load location data
         print("\n📍 Loading location data...")
@@ -0,0 +1,199 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from scripts.database import get_collection
+
+class EmailOutbox:
+    """Durable email queue backed by the email_outbox collection.
+
+    The request path only inserts a pending document. A pool of daemon
+    threads in each process claims due messages atomically with
+    find_one_and_update, sends them over SMTP and retries failures with
+    exponential backoff until EMAIL_MAX_ATTEMPTS is reached. Messages left
+    in 'sending' by a crashed worker are reclaimed after EMAIL_LOCK_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self):
+        # Workers only run where email is actually delivered through the outbox
+        self.enabled = (os.getenv('EMAIL_ENABLED', 'false').lower() == 'true' and
+                        os.getenv('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true')
+        self.worker_count = int(os.getenv('EMAIL_WORKERS', 2))
+        self.max_attempts = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+        self.backoff_seconds = float(os.getenv('EMAIL_BACKOFF_SECONDS', 30))
+        self.max_backoff_seconds = float(os.getenv('EMAIL_MAX_BACKOFF_SECONDS', 3600))
+        self.lock_timeout_seconds = float(os.getenv('EMAIL_LOCK_TIMEOUT_SECONDS', 300))
+        self.poll_seconds = float(os.getenv('EMAIL_POLL_SECONDS', 5))
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    @property
+    def collection(self):
+        return get_collection('email_outbox')
+
+    def enqueue(self, to_email: str, to_name: str, subject: str, html_content: str, text_content: str = None):
+        """Queue an email for background delivery and return its outbox id"""
+        now = datetime.utcnow()
+        result = self.collection.insert_one({
+            'toEmail': to_email,
+            'toName': to_name,
+            'subject': subject,
+            'htmlContent': html_content,
+            'textContent': text_content,
+            'status': 'pending',
+            'attempts': 0,
+            'nextAttemptAt': now,
+            'createdAt': now,
+            'updatedAt': now
+        })
+        self.start()
+        self._wakeup.set()
+        return result.inserted_id
+
+    def enqueue_many(self, messages: list):
+        """Queue many emails with one insert_many; messages use send_many's dict format"""
+        if not messages:
+            return []
+        now = datetime.utcnow()
+        result = self.collection.insert_many([{
+            'toEmail': message['to_email'],
+            'toName': message['to_name'],
+            'subject': message['subject'],
+            'htmlContent': message['html_content'],
+            'textContent': message.get('text_content'),
+            'status': 'pending',
+            'attempts': 0,
+            'nextAttemptAt': now,
+            'createdAt': now,
+            'updatedAt': now
+        } for message in messages], ordered=False)
+        self.start()
+        self._wakeup.set()
+        return result.inserted_ids
+
+    def start(self):
+        """Start this process's worker threads if they are not running"""
+        pid = os.getpid()
+        if not self.enabled or self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            # Threads never survive a fork, so start a fresh pool per process
+            self._stop.clear()
+            self._threads = []
+            for i in range(self.worker_count):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f'email-outbox-{i}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._pid = pid
+
+    def stop(self, timeout: float = 5):
+        """Stop worker threads (used by tests and graceful shutdown)"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def _worker_id(self):
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+    def claim_next(self):
+        """Atomically claim the next due message, or return None"""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self.lock_timeout_seconds)
+        return self.collection.find_one_and_update(
+            {'$or': [
+                {'status': 'pending', 'nextAttemptAt': {'$lte': now}},
+                {'status': 'sending', 'lockedAt': {'$lte': stale_before}}
+            ]},
+            {
+                '$set': {'status': 'sending', 'lockedAt': now, 'lockedBy': self._worker_id(), 'updatedAt': now},
+                '$inc': {'attempts': 1}
+            },
+            sort=[('nextAttemptAt', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_seconds * (2 ** (attempts - 1)), self.max_backoff_seconds)
+
+    def process(self, message, sender) -> bool:
+        """Deliver one claimed message with sender(...) and record the outcome"""
+        try:
+            sent = sender(
+                message['toEmail'],
+                message['toName'],
+                message['subject'],
+                message['htmlContent'],
+                message.get('textContent')
+            )
+            error = None if sent else 'SMTP send failed'
+        except Exception as e:
+            sent = False
+            error = str(e)
+
+        now = datetime.utcnow()
+        if sent:
+            update = {'$set': {'status': 'sent', 'sentAt': now, 'updatedAt': now},
+                      '$unset': {'lockedAt': '', 'lockedBy': ''}}
+        elif message['attempts'] >= self.max_attempts:
+            print(f"Giving up on email to {message['toEmail']} after {message['attempts']} attempts: {error}")
+            update = {'$set': {'status': 'failed', 'lastError': error, 'updatedAt': now},
+                      '$unset': {'lockedAt': '', 'lockedBy': ''}}
+        else:
+            retry_at = now + timedelta(seconds=self._backoff(message['attempts']))
+            update = {'$set': {'status': 'pending', 'nextAttemptAt': retry_at, 'lastError': error, 'updatedAt': now},
+                      '$unset': {'lockedAt': '', 'lockedBy': ''}}
+
+        self.collection.update_one({'_id': message['_id']}, update)
+        return sent
+
+    def drain(self, sender=None) -> int:
+        """Send every due message in the calling thread; returns the number sent"""
+        sender = sender or self._default_sender()
+        sent = 0
+        while True:
+            message = self.claim_next()
+            if not message:
+                return sent
+            if self.process(message, sender):
+                sent += 1
+
+    def _default_sender(self):
+        from services.email_service.email_service import email_service
+        return email_service._send_via_smtp
+
+    def _run(self):
+        sender = self._default_sender()
+        while not self._stop.is_set():
+            try:
+                self.drain(sender)
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+                traceback.print_exc()
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+    def get_stats(self):
+        """Count outbox messages by status for monitoring"""
+        counts = {'pending': 0, 'sending': 0, 'sent': 0, 'failed': 0}
+        for group in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            counts[group['_id']] = group['count']
+        counts['workers'] = len(self._threads) if self._pid == os.getpid() else 0
+        return counts
+
+# Global instance
+email_outbox = EmailOutbox()
@@ -0,0 +1,189 @@
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+# Per-message rejections that leave the session usable
+REJECTED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# Connection-level failures that warrant reconnecting and retrying once
+# (SMTPException subclasses OSError, so this also covers protocol errors)
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+class SMTPSession:
+    """One authenticated SMTP connection"""
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def is_alive(self) -> bool:
+        """NOOP health check"""
+        try:
+            return self.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def reset(self) -> bool:
+        """RSET after a failed transaction so the session can be reused"""
+        try:
+            return self.server.rset()[0] == 250
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+class SMTPSessionPool:
+    """Pool of persistent, authenticated SMTP sessions.
+
+    Sessions pay TCP + STARTTLS + AUTH once and are reused across messages.
+    Idle sessions are NOOP-checked before reuse and rotated after
+    SMTP_MAX_MESSAGES_PER_SESSION messages; a send that hits a dropped
+    connection reconnects and retries once.
+    """
+
+    def __init__(self):
+        self.pool_size = int(os.getenv('SMTP_POOL_SIZE', 2))
+        self.max_idle_seconds = float(os.getenv('SMTP_MAX_IDLE_SECONDS', 60))
+        self.max_messages = int(os.getenv('SMTP_MAX_MESSAGES_PER_SESSION', 100))
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle = []
+        self._pid = os.getpid()
+        self.connections_opened = 0
+
+    def _connect(self) -> SMTPSession:
+        smtp_server = os.getenv('SMTP_SERVER')
+        smtp_port = int(os.getenv('SMTP_PORT'))
+        smtp_use_tls = os.getenv('SMTP_USE_TLS').lower() == 'true'
+        timeout = float(os.getenv('SMTP_TIMEOUT_SECONDS', 30))
+
+        server = smtplib.SMTP(smtp_server, smtp_port, timeout=timeout)
+        try:
+            if smtp_use_tls:
+                server.starttls(context=ssl.create_default_context())
+            server.login(os.getenv('SMTP_USERNAME'), os.getenv('SMTP_APP_PASSWORD'))
+        except Exception:
+            server.close()
+            raise
+
+        with self._lock:
+            self.connections_opened += 1
+        print(f"SMTP session opened to {smtp_server}:{smtp_port}")
+        return SMTPSession(server)
+
+    def _check_fork(self):
+        # Sockets inherited from a parent process must not be shared
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = []
+                    self._slots = threading.BoundedSemaphore(self.pool_size)
+                    self._pid = os.getpid()
+
+    def acquire(self) -> SMTPSession:
+        """Take a healthy session from the pool, connecting if none is idle"""
+        self._check_fork()
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    session = self._idle.pop() if self._idle else None
+                if session is None:
+                    return self._connect()
+                if time.monotonic() - session.last_used < self.max_idle_seconds or session.is_alive():
+                    return session
+                session.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, session: SMTPSession, healthy: bool = True):
+        """Return a session to the pool, or close it if it is spent or broken"""
+        if healthy and session.messages_sent < self.max_messages:
+            session.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(session)
+        else:
+            session.close()
+        self._slots.release()
+
+    def _send_on(self, session: SMTPSession, from_email: str, to_email: str, message: str):
+        session.server.sendmail(from_email, to_email, message)
+        session.messages_sent += 1
+
+    def send_many(self, messages) -> list:
+        """Send (from_email, to_email, message) tuples over one session
+
+        Returns a list of booleans in the same order as messages.
+        """
+        results = []
+        completed = False
+        session = self.acquire()
+        try:
+            for from_email, to_email, message in messages:
+                if session is None:
+                    session = self._connect()
+                try:
+                    self._send_on(session, from_email, to_email, message)
+                    results.append(True)
+                    continue
+                except REJECTED_ERRORS as e:
+                    # Refused recipient or data error - the session itself is fine
+                    print(f"Gmail SMTP error for {to_email}: {e}")
+                    results.append(False)
+                except RECONNECT_ERRORS as e:
+                    print(f"SMTP session lost ({e}), reconnecting")
+                    session.close()
+                    session = self._connect()
+                    try:
+                        self._send_on(session, from_email, to_email, message)
+                        results.append(True)
+                        continue
+                    except Exception as retry_error:
+                        print(f"Gmail SMTP error for {to_email}: {retry_error}")
+                        results.append(False)
+
+                # Reuse the session only if it accepts RSET after the failure
+                if not session.reset():
+                    session.close()
+                    session = None
+            completed = True
+        finally:
+            # Anything not attempted counts as failed
+            results.extend([False] * (len(messages) - len(results)))
+            if session is None:
+                self._slots.release()
+            else:
+                self.release(session, healthy=completed)
+        return results
+
+    def send(self, from_email: str, to_email: str, message: str) -> bool:
+        return self.send_many([(from_email, to_email, message)])[0]
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'idleSessions': len(self._idle),
+                'poolSize': self.pool_size,
+                'connectionsOpened': self.connections_opened
+            }
+
+# Global instance
+smtp_pool = SMTPSessionPool()
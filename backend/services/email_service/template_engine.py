@@ -0,0 +1,56 @@
+import os
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+from utils.cache import TTLCache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+class EmailTemplateEngine:
+    """Renders email bodies from precompiled Jinja2 templates.
+
+    Every template under ``templates/`` is compiled once when the engine is
+    created. Each email type extends a shared layout (``layout.html`` /
+    ``layout.txt``); the ride details section depends only on the ride, so
+    it is rendered once per payload and cached, and a fan-out to N riders
+    only re-renders the personalized parts.
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(['html']),
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        self.templates = {name: self.env.get_template(name) for name in self.env.list_templates()}
+        self.section_cache = TTLCache(
+            'email_ride_sections',
+            max_size=int(os.getenv('EMAIL_RENDER_CACHE_SIZE', 256)),
+            ttl_seconds=int(os.getenv('EMAIL_RENDER_CACHE_TTL_SECONDS', 300))
+        )
+
+    def _ride_section(self, fmt: str, heading: str, ride_details: dict):
+        try:
+            key = (fmt, heading, tuple(sorted(ride_details.items())))
+            hash(key)
+        except TypeError:
+            key = None
+
+        def render():
+            return self.templates[f'_ride_details.{fmt}'].render(heading=heading, ride_details=ride_details)
+
+        section = self.section_cache.get_or_set(key, render) if key else render()
+        # The HTML section was escaped when it was rendered
+        return Markup(section) if fmt == 'html' else section
+
+    def render(self, name: str, ride_heading: str = 'Ride Details', **context) -> tuple:
+        """Render the html and text bodies of an email type; returns (html, text)"""
+        ride_details = context.get('ride_details', {})
+        bodies = []
+        for fmt in ('html', 'txt'):
+            ride_section = self._ride_section(fmt, ride_heading, ride_details)
+            bodies.append(self.templates[f'{name}.{fmt}'].render(ride_section=ride_section, **context))
+        return tuple(bodies)
+
+# Global instance
+email_templates = EmailTemplateEngine()
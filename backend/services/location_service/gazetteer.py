@@ -0,0 +1,192 @@
+import csv
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+from bson import ObjectId
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'locations.csv')
+
+def normalize(value) -> str:
+    """Normalize a location field for index keys and queries"""
+    return ' '.join(str(value or '').lower().split())
+
+def location_object_id(zip_code: str) -> ObjectId:
+    """Stable ObjectId for a ZIP code, shared by the CSV fallback and setup_cloud_database"""
+    return ObjectId(str(zip_code).zfill(24))
+
+class _GazetteerIndex:
+    """Immutable sorted-array prefix index over a snapshot of locations"""
+
+    def __init__(self, locations: List[Dict], fingerprint=None):
+        # Rank locations the same way the Mongo query sorted them
+        self.locations = sorted(locations, key=lambda loc: (loc['city'], loc['state'], loc['zipCode']))
+        self.fingerprint = fingerprint
+        self.by_id = {loc['_id']: loc for loc in self.locations}
+        self.by_zip = {loc['zipCode']: loc for loc in self.locations}
+        # A city under both its state code and state name: ("state college", "pa") and ("state college", "pennsylvania")
+        self.by_city = {}
+        for loc in self.locations:
+            for state in (loc['state'], loc['stateName']):
+                self.by_city.setdefault((normalize(loc['city']), normalize(state)), loc)
+
+        entries = []
+        for rank, loc in enumerate(self.locations):
+            keys = {normalize(loc['zipCode']), normalize(loc['state'])}
+            for field in ('city', 'stateName'):
+                value = normalize(loc[field])
+                words = value.split(' ')
+                # Index every word start so "york" finds "New York"
+                for i in range(len(words)):
+                    keys.add(' '.join(words[i:]))
+            for key in keys:
+                if key:
+                    entries.append((key, rank))
+
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = [rank for _, rank in entries]
+        # One- and two-character prefixes match thousands of entries
+        self._short_results = {}
+
+    def search(self, query: str, limit: int) -> List[Dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return self.locations[:limit]
+
+        if prefix in self._short_results:
+            return [self.locations[rank] for rank in self._short_results[prefix][:limit]]
+
+        start = bisect_left(self.keys, prefix)
+        matched = set()
+        for i in range(start, len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+            matched.add(self.ranks[i])
+
+        if len(prefix) <= 2:
+            self._short_results[prefix] = ranks = sorted(matched)
+            return [self.locations[rank] for rank in ranks[:limit]]
+
+        return [self.locations[rank] for rank in heapq.nsmallest(limit, matched)]
+
+class LocationGazetteer:
+    """In-process location index that serves autocomplete without querying Mongo.
+
+    The index is built lazily from the ``locations`` collection, falling back to
+    ``data/locations.csv`` when the collection is empty or unreachable. Call
+    ``refresh()`` after reloading location data; otherwise the collection is
+    re-checked at most every ``GAZETTEER_REFRESH_SECONDS`` and the index is
+    rebuilt when its document count or newest ``_id`` changes.
+    """
+
+    def __init__(self, collection_getter, csv_path: str = CSV_PATH):
+        self._collection_getter = collection_getter
+        self._csv_path = csv_path
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index = None
+        self._checked_at = 0.0
+        self.refresh_interval = int(os.getenv('GAZETTEER_REFRESH_SECONDS', 600))
+
+    def _fingerprint(self, collection):
+        newest = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return (collection.estimated_document_count(), newest['_id'] if newest else None)
+
+    def _load_from_collection(self):
+        collection = self._collection_getter()
+        fingerprint = self._fingerprint(collection)
+        projection = {'zipCode': 1, 'city': 1, 'state': 1, 'stateName': 1}
+        locations = list(collection.find({}, projection))
+        return locations, fingerprint
+
+    def _load_from_csv(self):
+        locations = []
+        with open(self._csv_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                zip_code = str(row['Zipcode']).strip().zfill(5)
+                city = str(row['City']).strip()
+                state = str(row['State Code']).strip()
+                if not city or not state:
+                    continue
+                locations.append({
+                    # Same id the setup script gives this ZIP code in Mongo
+                    '_id': location_object_id(zip_code),
+                    'zipCode': zip_code,
+                    'city': city,
+                    'state': state,
+                    'stateName': str(row['State']).strip()
+                })
+        return locations
+
+    def refresh(self) -> int:
+        """Rebuild the index from the locations collection (or CSV fallback)"""
+        fingerprint = None
+        try:
+            locations, fingerprint = self._load_from_collection()
+        except Exception as e:
+            print(f"Gazetteer could not read locations collection: {e}")
+            locations = []
+
+        if not locations:
+            try:
+                locations = self._load_from_csv()
+            except Exception as e:
+                print(f"Gazetteer could not read {self._csv_path}: {e}")
+
+        index = _GazetteerIndex(locations, fingerprint)
+        with self._lock:
+            self._index = index
+            self._checked_at = time.monotonic()
+        print(f"Gazetteer loaded {len(index.locations)} locations")
+        return len(index.locations)
+
+    def _ensure_fresh(self):
+        if self._index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self.refresh()
+            return
+
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = time.monotonic()
+
+        try:
+            if self._fingerprint(self._collection_getter()) != self._index.fingerprint:
+                self.refresh()
+        except Exception as e:
+            print(f"Gazetteer freshness check failed: {e}")
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Prefix search over city, state code, state name and ZIP code"""
+        self._ensure_fresh()
+        return self._index.search(query, limit)
+
+    def get(self, location_id: ObjectId) -> Optional[Dict]:
+        """Look up an indexed location by its _id"""
+        self._ensure_fresh()
+        return self._index.by_id.get(location_id)
+
+    def resolve(self, city: str, state: str, zip_code: str = None) -> Optional[Dict]:
+        """Find the location a parsed "City, State [ZIP]" names: by ZIP code first,
+        then by city with either the state code or the state name"""
+        self._ensure_fresh()
+        index = self._index
+        if zip_code and zip_code in index.by_zip:
+            return index.by_zip[zip_code]
+        return index.by_city.get((normalize(city), normalize(state)))
+
+    def invalidate(self):
+        """Force a freshness check on the next search"""
+        self._checked_at = 0.0
+
+    @property
+    def size(self) -> Optional[int]:
+        return len(self._index.locations) if self._index else None
@@ -1,49 +1,32 @@
 from scripts.database import get_collection
 from bson import ObjectId
 from typing import List, Dict, Optional
+from .gazetteer import LocationGazetteer, normalize
 import re
 
 class LocationService:
     def __init__(self):
-        self.locations = get_collection('locations')
+        self.gazetteer = LocationGazetteer(lambda: self.locations)
+    
+    @property
+    def locations(self):
+        return get_collection('locations')
     
     def search_locations(self, query: str, limit: int = 10) -> List[Dict]:
         """Search locations by ZIP code, city, or state - this is what users need"""
-        # Create search query
-        search_query = {
-            '$or': [
-                {'zipCode': {'$regex': query, '$options': 'i'}},
-                {'city': {'$regex': query, '$options': 'i'}},
-                {'state': {'$regex': query, '$options': 'i'}},
-                {'stateName': {'$regex': query, '$options': 'i'}}
-            ]
-        }
-        
-        # Find locations
-        locations = list(self.locations.find(search_query).sort([
-            ('city', 1),
-            ('state', 1)
-        ]).limit(limit))
-        
+        # Served from the in-memory gazetteer instead of a regex scan
+        locations = self.gazetteer.search(query, limit)
         return self._format_locations(locations)
     
-    def _get_word_conditions(self, query: str) -> List[Dict]:
-        """Generate word-based search conditions for multi-word queries"""
-        words = [word.strip() for word in query.split() if word.strip() and len(word.strip()) >= 2]
-        conditions = []
-        
-        for word in words:
-            conditions.extend([
-                {'displayName': {'$regex': word, '$options': 'i'}},
-                {'city': {'$regex': word, '$options': 'i'}},
-                {'stateName': {'$regex': word, '$options': 'i'}}
-            ])
-        
-        return conditions
+    def refresh_gazetteer(self) -> int:
+        """Rebuild the autocomplete index after the locations collection changes"""
+        return self.gazetteer.refresh()
     
     def get_location_by_id(self, location_id: str) -> Optional[Dict]:
         """Get a location by ID - needed for ride references"""
-        location = self.locations.find_one({'_id': ObjectId(location_id)})
+        location_id = ObjectId(location_id)
+        # The gazetteer also answers while it is serving the CSV fallback
+        location = self.gazetteer.get(location_id) or self.locations.find_one({'_id': location_id})
         return self._format_location(location) if location else None
     
     def _format_location(self, location: Dict) -> Dict:
@@ -74,26 +57,28 @@ class LocationService:
         locations = list(self.locations.find(query).sort('zipCode', 1))
         return self._format_locations(locations)
     
-    def get_all_city_display_names(self, city: str, state_name: str) -> List[str]:
-        """Get all possible display name variations for a city"""
-        query = {
-            'city': {'$regex': f'^{re.escape(city)}$', '$options': 'i'},
-            'stateName': {'$regex': f'^{re.escape(state_name)}$', '$options': 'i'}
-        }
-        
-        locations = list(self.locations.find(query).sort('zipCode', 1))
-        display_names = []
-        
-        for location in locations:
-            # Add both general city format and specific zip code format
-            general_name = f"{location['city']}, {location['stateName']}"
-            specific_name = f"{location['city']}, {location['stateName']} {location['zipCode']}"
-            
-            if general_name not in display_names:
-                display_names.append(general_name)
-            display_names.append(specific_name)
+    def get_city_key(self, city: str, state_name: str) -> str:
+        """Canonical key shared by every display name of a city"""
+        return f"{normalize(city)}|{normalize(state_name)}"
+    
+    def get_location_key(self, location_string: str) -> Dict:
+        """Canonical city key and ZIP code for a free-form location string
         
-        return display_names
+        The city is resolved through the gazetteer, by ZIP code first and then
+        by city with the state code or name, so "State College, PA" and
+        "State College, Pennsylvania 16801" share a key. Places the gazetteer
+        does not know are keyed by their parsed text, and strings that cannot
+        be parsed by their normalized text, so they still match themselves.
+        """
+        parsed = self.parse_location_string(location_string) if location_string else None
+        if parsed and parsed['city'] and parsed['state']:
+            location = self.gazetteer.resolve(parsed['city'], parsed['state'], parsed['zipCode'])
+            city, state_name = (location['city'], location['stateName']) if location else (parsed['city'], parsed['state'])
+            return {
+                'cityKey': self.get_city_key(city, state_name),
+                'zipCode': parsed['zipCode']
+            }
+        return {'cityKey': normalize(location_string), 'zipCode': None}
     
     def parse_location_string(self, location_string: str) -> Dict:
         """Parse a location string to extract city, state, and zip code"""
@@ -1 +1,2 @@
-from .notification_service import * 
\ No newline at end of file
+from .notification_service import * 
+from .notification_stream import notification_broker
@@ -1,13 +1,62 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import os
 from dotenv import load_dotenv
 from scripts.database import get_collection
 from services.email_service.email_service import email_service, EmailTemplates
+from utils.cache import TTLCache
+from utils.pagination import clamp_limit, keyset_filter, keyset_page
+from .notification_stream import notification_broker
 
 # Load environment variables
 load_dotenv()
 
+# Page size bounds for notification listing
+DEFAULT_NOTIFICATIONS_LIMIT = 20
+MAX_NOTIFICATIONS_LIMIT = 100
+
+# Read notifications older than this are deleted by the scheduled prune job
+READ_NOTIFICATION_RETENTION_DAYS = int(os.getenv('READ_NOTIFICATION_RETENTION_DAYS', 30))
+
+# Short-lived per-process cache of unread counts; local writes invalidate it
+unread_count_cache = TTLCache(
+    'unread_counts',
+    max_size=int(os.getenv('UNREAD_COUNT_CACHE_SIZE', 4096)),
+    ttl_seconds=int(os.getenv('UNREAD_COUNT_CACHE_TTL_SECONDS', 5))
+)
+
+def adjust_unread_counts(deltas):
+    """Apply {user_id: delta} to the materialized unread counters in one bulk write
+    
+    Only existing counters are adjusted. A user without one (e.g. from before
+    counters existed) is seeded from the notifications collection by
+    get_unread_count, which then already includes the new notifications.
+    """
+    operations = []
+    now = datetime.utcnow()
+    for user_id, delta in deltas.items():
+        user_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
+        if delta > 0:
+            operations.append(UpdateOne(
+                {'_id': user_id},
+                {'$inc': {'unread': delta}, '$set': {'updatedAt': now}}
+            ))
+        elif delta < 0:
+            # Never go below zero; reconcile_unread_counts repairs any drift
+            operations.append(UpdateOne(
+                {'_id': user_id, 'unread': {'$gte': -delta}},
+                {'$inc': {'unread': delta}, '$set': {'updatedAt': now}}
+            ))
+        unread_count_cache.delete(str(user_id))
+    
+    if operations:
+        get_collection('notification_counters').bulk_write(operations, ordered=False)
+
+def adjust_unread_count(user_id, delta):
+    adjust_unread_counts({user_id: delta})
+
 def create_notification(user_id, type, title, message, related_id=None):
     """Create a new notification"""
     try:
@@ -24,6 +73,8 @@ def create_notification(user_id, type, title, message, related_id=None):
         }
         
         notifications.insert_one(notification_data)
+        adjust_unread_count(notification_data['userId'], 1)
+        notification_broker.publish_created([notification_data])
         return True
     except Exception as e:
         print(f"Error creating notification: {e}")
@@ -121,143 +172,182 @@ def create_ride_interest_removed_notification(ride_id, removed_user_id, ride_det
     
     return notification_created
 
-def create_ride_update_notification(ride_id, ride_details):
-    """Create notification for ride updates"""
+def create_notifications_bulk(user_ids, type, title, message, related_id=None):
+    """Create the same notification for many users with one unordered insert_many"""
+    if not user_ids:
+        return 0
+    
+    try:
+        notifications = get_collection('notifications')
+        now = datetime.utcnow()
+        related_id = ObjectId(related_id) if related_id else None
+        
+        user_ids = [ObjectId(user_id) if isinstance(user_id, str) else user_id for user_id in user_ids]
+        
+        documents = [{
+            'userId': user_id,
+            'type': type,
+            'title': title,
+            'message': message,
+            'relatedId': related_id,
+            'read': False,
+            'createdAt': now
+        } for user_id in user_ids]
+        
+        try:
+            notifications.insert_many(documents, ordered=False)
+            failed = set()
+        except BulkWriteError as e:
+            # Unordered: everything except the failed documents was written
+            print(f"Error creating some notifications: {e.details.get('writeErrors')}")
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+        
+        deltas = {}
+        for index, user_id in enumerate(user_ids):
+            if index not in failed:
+                deltas[user_id] = deltas.get(user_id, 0) + 1
+        adjust_unread_counts(deltas)
+        notification_broker.publish_created(
+            [document for index, document in enumerate(documents) if index not in failed]
+        )
+        return len(user_ids) - len(failed)
+    except Exception as e:
+        print(f"Error creating notifications: {e}")
+        return 0
+
+def _fan_out_to_interested_users(ride_id, ride_details, type, title, message, render_email):
+    """Notify every user interested in a ride with a fixed number of queries
+    
+    Loads interests and users with one query each, writes all in-app
+    notifications with one insert_many and hands all emails to
+    email_service.send_many. render_email(user_name, ride_email_details)
+    returns (subject, html_content, text_content).
+    """
     ride_interests = get_collection('ride_interests')
-    interested_users = ride_interests.find({'rideId': ride_id})
-    users = get_collection('users')
+    user_ids = list({
+        interest['interestedUserId']
+        for interest in ride_interests.find({'rideId': ride_id}, {'interestedUserId': 1})
+    })
+    if not user_ids:
+        return 0
+    
+    notifications_created = create_notifications_bulk(user_ids, type, title, message, related_id=ride_id)
     
-    notifications_created = 0
-    for interest in interested_users:
-        # Create in-app notification
-        success = create_notification(
-            user_id=interest['interestedUserId'],
-            type='ride_update',
-            title='Ride Updated',
-            message=f"Your interested ride from {ride_details['startingFrom']} to {ride_details['goingTo']} has been updated",
-            related_id=ride_id
+    try:
+        users = get_collection('users')
+        interested_users = users.find(
+            {'_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}},
+            {'name': 1, 'email': 1}
         )
         
-        if success:
-            notifications_created += 1
-            
-            # Send email notification
-            try:
-                interested_user = users.find_one({'_id': ObjectId(interest['interestedUserId'])})
-                if interested_user and interested_user.get('email'):
-                    # Prepare ride details for email
-                    ride_email_details = {
-                        'source': ride_details.get('startingFrom', ''),
-                        'destination': ride_details.get('goingTo', ''),
-                        'date': ride_details.get('travelDate', ''),
-                        'time': f"{ride_details.get('departureStartTime', '')} - {ride_details.get('departureEndTime', '')}"
-                    }
-                    
-                    # For ride updates, we need to determine which fields were updated
-                    updated_fields = ['ride details']  # Generic for now - could be more specific
-                    
-                    frontend_url = os.getenv('FRONTEND_URL')
-                    subject, html_content, text_content = EmailTemplates.ride_updated_notification(
-                        interested_user['name'], 
-                        ride_email_details,
-                        updated_fields,
-                        frontend_url
-                    )
-                    email_service.send_email(
-                        to_email=interested_user['email'],
-                        to_name=interested_user['name'],
-                        subject=subject,
-                        html_content=html_content,
-                        text_content=text_content
-                    )
-            except Exception as e:
-                print(f"Error sending ride update email to {interest['interestedUserId']}: {e}")
+        # Prepare ride details for email
+        ride_email_details = {
+            'source': ride_details.get('startingFrom', ''),
+            'destination': ride_details.get('goingTo', ''),
+            'date': ride_details.get('travelDate', ''),
+            'time': f"{ride_details.get('departureStartTime', '')} - {ride_details.get('departureEndTime', '')}"
+        }
+        
+        emails = []
+        for interested_user in interested_users:
+            if not interested_user.get('email'):
+                continue
+            subject, html_content, text_content = render_email(interested_user['name'], ride_email_details)
+            emails.append({
+                'to_email': interested_user['email'],
+                'to_name': interested_user['name'],
+                'subject': subject,
+                'html_content': html_content,
+                'text_content': text_content
+            })
+        
+        email_service.send_many(emails)
+    except Exception as e:
+        print(f"Error sending {type} emails for ride {ride_id}: {e}")
     
     return notifications_created
 
+def create_ride_update_notification(ride_id, ride_details):
+    """Create notification for ride updates"""
+    # For ride updates, we need to determine which fields were updated
+    updated_fields = ['ride details']  # Generic for now - could be more specific
+    frontend_url = os.getenv('FRONTEND_URL')
+    
+    return _fan_out_to_interested_users(
+        ride_id,
+        ride_details,
+        type='ride_update',
+        title='Ride Updated',
+        message=f"Your interested ride from {ride_details['startingFrom']} to {ride_details['goingTo']} has been updated",
+        render_email=lambda name, details: EmailTemplates.ride_updated_notification(
+            name, details, updated_fields, frontend_url
+        )
+    )
+
 def create_ride_cancellation_notifications(ride_id, ride_details):
     """Create notifications for ride cancellation"""
-    ride_interests = get_collection('ride_interests')
-    interested_users = ride_interests.find({'rideId': ride_id})
-    users = get_collection('users')
+    frontend_url = os.getenv('FRONTEND_URL')
     
-    notifications_created = 0
-    for interest in interested_users:
-        # Create in-app notification
-        success = create_notification(
-            user_id=interest['interestedUserId'],
-            type='ride_cancelled',
-            title='Ride Cancelled',
-            message=f"Your interested ride from {ride_details['startingFrom']} to {ride_details['goingTo']} has been cancelled",
-            related_id=ride_id
+    return _fan_out_to_interested_users(
+        ride_id,
+        ride_details,
+        type='ride_cancelled',
+        title='Ride Cancelled',
+        message=f"Your interested ride from {ride_details['startingFrom']} to {ride_details['goingTo']} has been cancelled",
+        render_email=lambda name, details: EmailTemplates.ride_cancelled_notification(
+            name, details, frontend_url
         )
-        
-        if success:
-            notifications_created += 1
-            
-            # Send email notification
-            try:
-                interested_user = users.find_one({'_id': ObjectId(interest['interestedUserId'])})
-                if interested_user and interested_user.get('email'):
-                    # Prepare ride details for email
-                    ride_email_details = {
-                        'source': ride_details.get('startingFrom', ''),
-                        'destination': ride_details.get('goingTo', ''),
-                        'date': ride_details.get('travelDate', ''),
-                        'time': f"{ride_details.get('departureStartTime', '')} - {ride_details.get('departureEndTime', '')}"
-                    }
-                    
-                    frontend_url = os.getenv('FRONTEND_URL')
-                    subject, html_content, text_content = EmailTemplates.ride_cancelled_notification(
-                        interested_user['name'], 
-                        ride_email_details,
-                        frontend_url
-                    )
-                    email_service.send_email(
-                        to_email=interested_user['email'],
-                        to_name=interested_user['name'],
-                        subject=subject,
-                        html_content=html_content,
-                        text_content=text_content
-                    )
-            except Exception as e:
-                print(f"Error sending ride cancellation email to {interest['interestedUserId']}: {e}")
-    
-    return notifications_created
+    )
 
-def get_user_notifications(user_id, page=1, per_page=20, unread_only=False):
-    """Get paginated notifications for a user"""
+def get_user_notifications(user_id, cursor=None, limit=DEFAULT_NOTIFICATIONS_LIMIT, unread_only=False):
+    """Get one page of a user's notifications, newest first
+    
+    Uses keyset pagination on (createdAt, _id) so every page is a bounded
+    range scan of user_created_id_idx regardless of depth. Returns
+    (notifications, next_cursor); next_cursor is None on the last page.
+    """
     notifications = get_collection('notifications')
+    limit = clamp_limit(limit, DEFAULT_NOTIFICATIONS_LIMIT, MAX_NOTIFICATIONS_LIMIT)
     
     # Build query
     query = {'userId': ObjectId(user_id)}
     if unread_only:
         query['read'] = False
+    if cursor:
+        query.update(keyset_filter(cursor))
     
-    # Get total count
-    total_count = notifications.count_documents(query)
-    
-    # Get paginated notifications
-    skip = (page - 1) * per_page
-    user_notifications = list(
-        notifications.find(query)
-        .sort('createdAt', -1)
-        .skip(skip)
-        .limit(per_page)
-    )
-    
-    return user_notifications, total_count
+    return keyset_page(notifications, query, limit)
 
 def get_unread_count(user_id):
-    """Get count of unread notifications for a user"""
-    notifications = get_collection('notifications')
-    return notifications.count_documents({
-        'userId': ObjectId(user_id),
-        'read': False
-    })
+    """Get count of unread notifications for a user
+    
+    Reads the materialized counter in notification_counters. A user without
+    a counter yet is counted once from the notifications collection and the
+    counter is seeded.
+    """
+    user_id = ObjectId(user_id)
+    
+    def load():
+        counters = get_collection('notification_counters')
+        counter = counters.find_one({'_id': user_id}, {'unread': 1})
+        if counter:
+            return counter['unread']
+        
+        unread = get_collection('notifications').count_documents({'userId': user_id, 'read': False})
+        counters.update_one(
+            {'_id': user_id},
+            {'$setOnInsert': {'unread': unread, 'updatedAt': datetime.utcnow()}},
+            upsert=True
+        )
+        return unread
+    
+    return unread_count_cache.get_or_set(str(user_id), load)
 
 def mark_notification_as_read(notification_id, user_id):
-    """Mark a specific notification as read"""
+    """Mark a specific notification as read
+    
+    Returns False if the notification does not exist for this user.
+    """
     notifications = get_collection('notifications')
     
     result = notifications.update_one(
@@ -268,7 +358,11 @@ def mark_notification_as_read(notification_id, user_id):
         {'$set': {'read': True}}
     )
     
-    return result.modified_count > 0
+    # modified_count is 1 only if the notification was still unread
+    if result.modified_count:
+        adjust_unread_count(user_id, -1)
+    
+    return result.matched_count > 0
 
 def mark_all_notifications_as_read(user_id):
     """Mark all user's unread notifications as read"""
@@ -282,15 +376,74 @@ def mark_all_notifications_as_read(user_id):
         {'$set': {'read': True}}
     )
     
+    get_collection('notification_counters').update_one(
+        {'_id': ObjectId(user_id)},
+        {'$set': {'unread': 0, 'updatedAt': datetime.utcnow()}},
+        upsert=True
+    )
+    unread_count_cache.delete(str(user_id))
+    
     return result.modified_count
 
 def delete_notification(notification_id, user_id):
     """Delete a notification"""
     notifications = get_collection('notifications')
     
-    result = notifications.delete_one({
-        '_id': ObjectId(notification_id),
-        'userId': ObjectId(user_id)
-    })
+    deleted = notifications.find_one_and_delete(
+        {
+            '_id': ObjectId(notification_id),
+            'userId': ObjectId(user_id)
+        },
+        projection={'read': 1}
+    )
+    
+    if deleted and not deleted.get('read', False):
+        adjust_unread_count(user_id, -1)
+    
+    return deleted is not None
+
+def reconcile_unread_counts():
+    """Repair drift between notification_counters and the notifications collection
+    
+    Returns the number of counters that were corrected or created.
+    """
+    notifications = get_collection('notifications')
+    counters = get_collection('notification_counters')
+    
+    actual_counts = {
+        group['_id']: group['count']
+        for group in notifications.aggregate([
+            {'$match': {'read': False}},
+            {'$group': {'_id': '$userId', 'count': {'$sum': 1}}}
+        ])
+    }
+    
+    now = datetime.utcnow()
+    operations = []
+    for counter in counters.find({}, {'unread': 1}):
+        actual = actual_counts.pop(counter['_id'], 0)
+        if counter.get('unread') != actual:
+            operations.append(UpdateOne({'_id': counter['_id']}, {'$set': {'unread': actual, 'updatedAt': now}}))
+    
+    # Users with unread notifications but no counter yet
+    for user_id, actual in actual_counts.items():
+        operations.append(UpdateOne({'_id': user_id}, {'$set': {'unread': actual, 'updatedAt': now}}, upsert=True))
+    
+    repaired = 0
+    for i in range(0, len(operations), 1000):
+        result = counters.bulk_write(operations[i:i + 1000], ordered=False)
+        repaired += result.modified_count + result.upserted_count
+    
+    unread_count_cache.clear()
+    return repaired
+
+def prune_read_notifications(retention_days: int = None):
+    """Delete read notifications older than retention_days; returns the number deleted
     
-    return result.deleted_count > 0 
\ No newline at end of file
+    Unread notifications are kept regardless of age, so unread counters
+    are unaffected.
+    """
+    days = READ_NOTIFICATION_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = get_collection('notifications').delete_many({'read': True, 'createdAt': {'$lt': cutoff}})
+    return result.deleted_count
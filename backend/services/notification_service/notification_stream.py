@@ -0,0 +1,164 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from scripts.database import get_collection
+
+class NotificationBroker:
+    """Fans new notifications out to this process's SSE subscribers.
+
+    Notifications are read from a single shared change stream on the
+    ``notifications`` collection, so every process sees inserts made by any
+    other process. When change streams are unavailable (a standalone server
+    or mongomock) the broker falls back to in-process pub/sub fed by
+    ``publish_created``, which only reaches subscribers in the process that
+    created the notification.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv('SSE_MAX_CONNECTIONS', 100))
+        self.queue_size = int(os.getenv('SSE_QUEUE_SIZE', 100))
+        self.heartbeat_seconds = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+        self.max_stream_seconds = float(os.getenv('SSE_MAX_STREAM_SECONDS', 300))
+        self.retry_ms = int(os.getenv('SSE_RETRY_MS', 5000))
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._connections = 0
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._resume_token = None
+        self.mode = None
+
+    def _check_fork(self):
+        # Subscribers and the watcher thread belong to the parent process
+        if self._pid != os.getpid():
+            self._subscribers = {}
+            self._connections = 0
+            self._thread = None
+            self.mode = None
+            self._pid = os.getpid()
+
+    def start(self):
+        """Open the shared change stream, or fall back to in-process pub/sub"""
+        with self._lock:
+            self._check_fork()
+            if self.mode is not None:
+                return
+
+            try:
+                stream = self._open_stream()
+            except (OperationFailure, NotImplementedError, TypeError) as e:
+                # Standalone servers reject $changeStream; mongomock has no watch()
+                print(f"Notification change stream unavailable, using in-process pub/sub: {e}")
+                self.mode = 'local'
+                return
+
+            self.mode = 'change_stream'
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, args=(stream,), name='notification-stream', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _open_stream(self):
+        return get_collection('notifications').watch(
+            [{'$match': {'operationType': 'insert'}}],
+            resume_after=self._resume_token
+        )
+
+    def _watch(self, stream):
+        while not self._stop.is_set():
+            try:
+                with stream:
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._resume_token = change['_id']
+                        self._dispatch(change['fullDocument'])
+            except PyMongoError as e:
+                print(f"Notification change stream error, resuming: {e}")
+            except Exception as e:
+                print(f"Notification stream worker error: {e}")
+                traceback.print_exc()
+
+            # Reopen after the last delivered event
+            while not self._stop.is_set():
+                try:
+                    stream = self._open_stream()
+                    break
+                except PyMongoError as e:
+                    print(f"Could not reopen notification change stream: {e}")
+                    self._resume_token = None
+                    time.sleep(5)
+
+    def _dispatch(self, notification):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(notification['userId']), ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(notification)
+            except queue.Full:
+                # A stalled client; it will catch up from Last-Event-ID on reconnect
+                pass
+
+    def publish_created(self, notifications):
+        """Deliver freshly inserted notifications when no change stream is running"""
+        if self.mode != 'local':
+            return
+        for notification in notifications:
+            self._dispatch(notification)
+
+    def subscribe(self, user_id):
+        """Register an SSE connection; returns its queue, or None at the connection limit"""
+        self.start()
+        with self._lock:
+            if self._connections >= self.max_connections:
+                return None
+            self._connections += 1
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.setdefault(str(user_id), set()).add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self._connections -= 1
+                if not subscribers:
+                    del self._subscribers[str(user_id)]
+
+    def replay_since(self, user_id, last_event_id, limit: int = 100):
+        """Notifications created after the event the client last received
+
+        Event ids are notification ObjectIds, so Last-Event-ID works as a
+        resume token in both change-stream and in-process modes.
+        """
+        try:
+            last_id = ObjectId(last_event_id)
+        except Exception:
+            return []
+        return list(
+            get_collection('notifications')
+            .find({'userId': ObjectId(user_id), '_id': {'$gt': last_id}})
+            .sort('_id', 1)
+            .limit(limit)
+        )
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'connections': self._connections if self._pid == os.getpid() else 0,
+                'maxConnections': self.max_connections,
+                'subscribedUsers': len(self._subscribers) if self._pid == os.getpid() else 0
+            }
+
+# Global instance
+notification_broker = NotificationBroker()
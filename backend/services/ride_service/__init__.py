@@ -1 +1,3 @@
-from .ride_matching import * 
\ No newline at end of file
+from .ride_matching import * 
+from .seat_reservations import *
+from .ride_maintenance import *
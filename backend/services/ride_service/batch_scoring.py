@@ -0,0 +1,125 @@
+from datetime import datetime
+import numpy as np
+
+# Score weights - must stay in sync with calculate_base_score in ride_matching
+TIME_WEIGHT = 0.3
+SEAT_WEIGHT = 0.1
+POPULARITY_WEIGHT = 0.05
+RECENCY_WEIGHT = 0.05
+
+def time_to_minutes(time_str):
+    """Convert an "HH:MM" string to minutes after midnight"""
+    hours, minutes = map(int, time_str.split(':'))
+    return hours * 60 + minutes
+
+def _days_until_travel(travel_dates, today):
+    """Days from today to each travel date, NaN where the date cannot be parsed"""
+    today = np.datetime64(today, 'D')
+    try:
+        dates = np.array(travel_dates, dtype='datetime64[D]')
+        return (dates - today).astype(np.float64)
+    except (ValueError, TypeError):
+        pass
+
+    # Mixed or malformed values - parse one by one like the scalar path
+    days = np.full(len(travel_dates), np.nan)
+    for i, value in enumerate(travel_dates):
+        try:
+            if isinstance(value, str):
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            days[i] = (np.datetime64(value, 'D') - today).astype(np.float64)
+        except (ValueError, TypeError):
+            continue
+    return days
+
+def _departure_minutes(ride, prefix):
+    """Use the stored minute-of-day field, parsing the "HH:MM" string for older rides"""
+    minutes = ride.get(f'{prefix}Minutes')
+    if minutes is None:
+        minutes = time_to_minutes(ride[f'{prefix}Time'])
+    return minutes
+
+def build_ride_columns(rides):
+    """Convert ride documents into columnar NumPy arrays for batch scoring"""
+    return {
+        'start': np.array([_departure_minutes(ride, 'departureStart') for ride in rides], dtype=np.int64),
+        'end': np.array([_departure_minutes(ride, 'departureEnd') for ride in rides], dtype=np.int64),
+        'seatsRemaining': np.array([ride['seatsRemaining'] for ride in rides], dtype=np.float64),
+        'availableSeats': np.array([ride['availableSeats'] for ride in rides], dtype=np.float64),
+        'interestCount': np.array([ride.get('interestCount', 0) for ride in rides], dtype=np.float64),
+        'daysUntilTravel': _days_until_travel([ride['travelDate'] for ride in rides], datetime.now().date())
+    }
+
+def batch_time_overlap_mask(start, end, rider_start, rider_end):
+    """Vectorized has_time_overlap: start1 <= end2 AND start2 <= end1"""
+    return (start <= rider_end) & (rider_start <= end)
+
+def batch_time_overlap(start, end, rider_start, rider_end):
+    """Vectorized calculate_time_overlap"""
+    overlap_duration = np.minimum(end, rider_end) - np.maximum(start, rider_start)
+    total_duration = np.minimum(end - start, rider_end - rider_start)
+
+    valid = (overlap_duration > 0) & (total_duration > 0)
+    ratio = np.zeros(len(start), dtype=np.float64)
+    np.divide(overlap_duration, total_duration, out=ratio, where=valid)
+    return ratio
+
+def batch_base_scores(columns, search_criteria):
+    """Vectorized calculate_base_score over columns from build_ride_columns
+
+    Terms are accumulated in the same order as the scalar function so the
+    results are bit-for-bit identical.
+    """
+    count = len(columns['start'])
+    score = np.zeros(count, dtype=np.float64)
+
+    # Time overlap (30% weight) - only if time preferences are provided
+    if search_criteria.get('preferredStartTime') and search_criteria.get('preferredEndTime'):
+        time_overlap = batch_time_overlap(
+            columns['start'],
+            columns['end'],
+            time_to_minutes(search_criteria['preferredStartTime']),
+            time_to_minutes(search_criteria['preferredEndTime'])
+        )
+        score += time_overlap * TIME_WEIGHT
+    else:
+        score += TIME_WEIGHT
+
+    # Seat availability (10% weight)
+    seat_score = np.minimum(columns['seatsRemaining'] / columns['availableSeats'], 1.0)
+    score += seat_score * SEAT_WEIGHT
+
+    # Popularity bonus (5% weight), capped at 5 interests
+    popularity_score = np.minimum(columns['interestCount'] / 5.0, 1.0)
+    score += popularity_score * POPULARITY_WEIGHT
+
+    # Recency bonus (5% weight); unparseable dates get a neutral score
+    days = columns['daysUntilTravel']
+    recency_score = np.maximum(0, 1 - (days / 30))
+    score += np.where(np.isnan(days), 0.5, recency_score) * RECENCY_WEIGHT
+
+    return score
+
+def batch_score_rides(rides, search_criteria):
+    """Filter and base-score a batch of rides in one pass
+
+    Returns (mask, base_scores): mask is False for rides with no overlap with
+    the rider's preferred time window, and base_scores matches
+    calculate_base_score for every ride.
+    """
+    if not rides:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+
+    columns = build_ride_columns(rides)
+
+    if search_criteria.get('preferredStartTime') and search_criteria.get('preferredEndTime'):
+        mask = batch_time_overlap_mask(
+            columns['start'],
+            columns['end'],
+            time_to_minutes(search_criteria['preferredStartTime']),
+            time_to_minutes(search_criteria['preferredEndTime'])
+        )
+    else:
+        mask = np.ones(len(rides), dtype=bool)
+
+    return mask, batch_base_scores(columns, search_criteria)
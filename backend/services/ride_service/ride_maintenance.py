@@ -0,0 +1,82 @@
+import os
+from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError
+from scripts.database import get_collection
+from .search_cache import ride_search_cache
+
+RIDE_EXPIRY_GRACE_DAYS = int(os.getenv('RIDE_EXPIRY_GRACE_DAYS', 1))
+RIDE_ARCHIVE_AFTER_DAYS = int(os.getenv('RIDE_ARCHIVE_AFTER_DAYS', 7))
+ARCHIVED_RIDE_STATUSES = ['completed', 'cancelled']
+MAINTENANCE_BATCH_SIZE = 1000
+
+def _date_cutoff(days: int) -> str:
+    # travelDate is stored as YYYY-MM-DD, so string comparison orders by date
+    return (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def expire_past_rides(grace_days: int = None):
+    """Mark active rides whose travelDate has passed as completed
+
+    grace_days (RIDE_EXPIRY_GRACE_DAYS) keeps rides active a little past
+    their date, so time zones never complete a ride early. Returns the
+    number of rides completed.
+    """
+    ride_posts = get_collection('ride_posts')
+    cutoff = _date_cutoff(RIDE_EXPIRY_GRACE_DAYS if grace_days is None else grace_days)
+
+    completed = 0
+    while True:
+        batch = list(
+            ride_posts.find(
+                {'status': 'active', 'travelDate': {'$lt': cutoff}},
+                {'startingFrom': 1, 'goingTo': 1, 'travelDate': 1}
+            ).limit(MAINTENANCE_BATCH_SIZE)
+        )
+        if not batch:
+            return completed
+
+        now = datetime.utcnow()
+        result = ride_posts.update_many(
+            {'_id': {'$in': [ride['_id'] for ride in batch]}, 'status': 'active'},
+            {'$set': {'status': 'completed', 'completedAt': now, 'updatedAt': now}}
+        )
+        ride_search_cache.invalidate_ride(*batch)
+        completed += result.modified_count
+
+def _copy_to_archive(archive, documents):
+    """Insert documents into an archive collection, keeping their _id"""
+    if not documents:
+        return
+    now = datetime.utcnow()
+    try:
+        archive.insert_many([dict(document, archivedAt=now) for document in documents], ordered=False)
+    except BulkWriteError as e:
+        # Documents copied by an interrupted earlier run are already there
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+def archive_finished_rides(after_days: int = None):
+    """Move completed/cancelled rides and their interests into the archive collections
+
+    Rides are archived once their travelDate is more than after_days
+    (RIDE_ARCHIVE_AFTER_DAYS) ago, so ride_posts only holds current rides
+    and its indexes stay proportional to them. Interests are copied and
+    removed before their ride, so a rerun after a crash finishes the move.
+    Returns the number of rides archived.
+    """
+    ride_posts = get_collection('ride_posts')
+    ride_interests = get_collection('ride_interests')
+    cutoff = _date_cutoff(RIDE_ARCHIVE_AFTER_DAYS if after_days is None else after_days)
+    finished = {'status': {'$in': ARCHIVED_RIDE_STATUSES}, 'travelDate': {'$lt': cutoff}}
+
+    archived = 0
+    while True:
+        rides = list(ride_posts.find(finished).limit(MAINTENANCE_BATCH_SIZE))
+        if not rides:
+            return archived
+
+        ride_ids = [ride['_id'] for ride in rides]
+        _copy_to_archive(get_collection('ride_interests_archive'), list(ride_interests.find({'rideId': {'$in': ride_ids}})))
+        ride_interests.delete_many({'rideId': {'$in': ride_ids}})
+
+        _copy_to_archive(get_collection('ride_posts_archive'), rides)
+        archived += ride_posts.delete_many(dict(finished, _id={'$in': ride_ids})).deleted_count
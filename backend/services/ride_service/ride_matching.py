@@ -1,8 +1,27 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import heapq
 from scripts.database import get_collection
 from services.location_service import location_service
+from .batch_scoring import batch_score_rides, time_to_minutes
+from .search_cache import ride_search_cache
+from utils.pagination import clamp_limit, keyset_filter, keyset_page
 import re
 
+# Candidates scored together by the vectorized engine in search_rides_page
+SCORING_BATCH_SIZE = 512
+
+# Page size bounds and fields returned by list_active_rides
+DEFAULT_RIDES_LIMIT = 20
+MAX_RIDES_LIMIT = 100
+# The working set of bookable rides; ride_posts search indexes are partial on exactly this
+HOT_RIDES_FILTER = {'status': 'active', 'seatsRemaining': {'$gt': 0}}
+
+RIDE_LIST_FIELDS = (
+    'userId', 'startingFrom', 'goingTo', 'travelDate', 'departureStartTime',
+    'departureEndTime', 'availableSeats', 'seatsRemaining', 'interestCount',
+    'suggestedContribution', 'status', 'createdAt'
+)
+
 def calculate_time_overlap(driver_start_time, driver_end_time, rider_start_time, rider_end_time):
     """Calculate overlap between driver's time range and rider's preferred time"""
     # Convert time strings to minutes for easier comparison
@@ -27,6 +46,95 @@ def calculate_time_overlap(driver_start_time, driver_end_time, rider_start_time,
     
     return overlap_duration / total_duration if total_duration > 0 else 0.0
 
+def get_departure_minutes(ride_data):
+    """Minute-of-day fields for whichever departure times are present in ride_data
+    
+    Stored alongside the "HH:MM" strings so time overlap can be queried in Mongo.
+    """
+    fields = {}
+    if ride_data.get('departureStartTime'):
+        fields['departureStartMinutes'] = time_to_minutes(ride_data['departureStartTime'])
+    if ride_data.get('departureEndTime'):
+        fields['departureEndMinutes'] = time_to_minutes(ride_data['departureEndTime'])
+    return fields
+
+def get_route_keys(ride_data):
+    """Canonical origin/destination city keys and ZIP codes for whichever locations are present
+    
+    Stored alongside the display strings so route lookups are an equality
+    match on route_date_status_idx instead of a $in over every display name.
+    """
+    fields = {}
+    for field, prefix in (('startingFrom', 'origin'), ('goingTo', 'destination')):
+        if ride_data.get(field):
+            location_key = location_service.get_location_key(ride_data[field])
+            fields[f'{prefix}CityKey'] = location_key['cityKey']
+            fields[f'{prefix}ZipCode'] = location_key['zipCode']
+    return fields
+
+def backfill_route_keys(recompute=False):
+    """Write originCityKey/destinationCityKey (and ZIP codes) on rides missing them
+    
+    recompute=True re-resolves every ride's keys, e.g. after key resolution
+    changed. Returns the number of rides updated.
+    """
+    from pymongo import UpdateOne
+    
+    ride_posts = get_collection('ride_posts')
+    query = {} if recompute else {'$or': [
+        {'originCityKey': {'$exists': False}},
+        {'destinationCityKey': {'$exists': False}}
+    ]}
+    projection = {'startingFrom': 1, 'goingTo': 1}
+    
+    operations = []
+    updated = 0
+    for ride in ride_posts.find(query, projection):
+        fields = get_route_keys(ride)
+        if fields:
+            operations.append(UpdateOne({'_id': ride['_id']}, {'$set': fields}))
+        if len(operations) >= 1000:
+            updated += ride_posts.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    
+    if operations:
+        updated += ride_posts.bulk_write(operations, ordered=False).modified_count
+    
+    return updated
+
+def backfill_departure_minutes():
+    """Write departureStartMinutes/departureEndMinutes on rides missing them
+    
+    Returns the number of rides updated.
+    """
+    from pymongo import UpdateOne
+    
+    ride_posts = get_collection('ride_posts')
+    query = {'$or': [
+        {'departureStartMinutes': {'$exists': False}},
+        {'departureEndMinutes': {'$exists': False}}
+    ]}
+    projection = {'departureStartTime': 1, 'departureEndTime': 1}
+    
+    operations = []
+    updated = 0
+    for ride in ride_posts.find(query, projection):
+        try:
+            fields = get_departure_minutes(ride)
+        except ValueError:
+            print(f"Skipping ride {ride['_id']} with malformed departure times")
+            continue
+        if fields:
+            operations.append(UpdateOne({'_id': ride['_id']}, {'$set': fields}))
+        if len(operations) >= 1000:
+            updated += ride_posts.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    
+    if operations:
+        updated += ride_posts.bulk_write(operations, ordered=False).modified_count
+    
+    return updated
+
 def validate_time_format(time_str):
     """Validate time format (HH:MM in 24-hour format)"""
     import re
@@ -47,35 +155,24 @@ def is_valid_time_range(start_time, end_time):
     return start_min < end_min
 
 def calculate_location_match_score(ride, search_criteria):
-    """Calculate location matching score with intelligent city-level matching"""
-    starting_score = 0.0
-    destination_score = 0.0
+    """Calculate location matching score with intelligent city-level matching
+    
+    Locations match when their canonical city keys are equal; the ride's
+    stored originCityKey/destinationCityKey are used when present.
+    """
+    def side_score(field, key_field):
+        search_value = search_criteria.get(field)
+        ride_value = ride.get(field, '')
+        # Give higher score for exact matches, lower for city-level matches
+        if ride_value == search_value:
+            return 1.0  # Exact match
+        ride_key = ride.get(key_field) or location_service.get_location_key(ride_value)['cityKey']
+        if ride_key == location_service.get_location_key(search_value)['cityKey']:
+            return 0.9  # City-level match
+        return 0.0
     
-    # Check starting location match
-    if search_criteria.get('startingFrom'):
-        search_starting_variations = get_location_variations(search_criteria['startingFrom'])
-        ride_starting_variations = get_location_variations(ride.get('startingFrom', ''))
-        
-        # Check if there's any overlap between variations
-        if any(var in ride_starting_variations for var in search_starting_variations):
-            # Give higher score for exact matches, lower for city-level matches
-            if ride['startingFrom'] == search_criteria['startingFrom']:
-                starting_score = 1.0  # Exact match
-            else:
-                starting_score = 0.9  # City-level match
-    
-    # Check destination match
-    if search_criteria.get('goingTo'):
-        search_destination_variations = get_location_variations(search_criteria['goingTo'])
-        ride_destination_variations = get_location_variations(ride.get('goingTo', ''))
-        
-        # Check if there's any overlap between variations
-        if any(var in ride_destination_variations for var in search_destination_variations):
-            # Give higher score for exact matches, lower for city-level matches
-            if ride['goingTo'] == search_criteria['goingTo']:
-                destination_score = 1.0  # Exact match
-            else:
-                destination_score = 0.9  # City-level match
+    starting_score = side_score('startingFrom', 'originCityKey') if search_criteria.get('startingFrom') else 0.0
+    destination_score = side_score('goingTo', 'destinationCityKey') if search_criteria.get('goingTo') else 0.0
     
     # Both locations must match for a valid ride
     if starting_score > 0 and destination_score > 0:
@@ -83,13 +180,93 @@ def calculate_location_match_score(ride, search_criteria):
     else:
         return 0.0
 
+def reconcile_interest_counts(settle_seconds=0):
+    """Repair drift between ride_posts.interestCount and the ride_interests collection
+    
+    Each interest holds one seat, so seatsRemaining is repaired to
+    availableSeats minus the interest count as well. Repairs only apply if
+    the ride's counters are unchanged since they were read.
+    
+    Expressing or removing interest writes ride_interests a moment before
+    the ride's counters, so a request in flight looks like drift. With
+    settle_seconds (used by the scheduled job) drift is first recorded in
+    counterDrift and only repaired once a later run sees the same counters
+    and count at least settle_seconds afterwards. Returns the number of
+    rides whose stored counters were corrected.
+    """
+    from pymongo import UpdateOne
+    
+    ride_posts = get_collection('ride_posts')
+    ride_interests = get_collection('ride_interests')
+    
+    actual_counts = {
+        group['_id']: group['count']
+        for group in ride_interests.aggregate([
+            {'$group': {'_id': '$rideId', 'count': {'$sum': 1}}}
+        ])
+    }
+    
+    now = datetime.utcnow()
+    repairs = []
+    markers = []
+    repaired = 0
+    projection = {'interestCount': 1, 'availableSeats': 1, 'seatsRemaining': 1, 'counterDrift': 1}
+    for ride in ride_posts.find({}, projection):
+        if len(repairs) >= 1000:
+            repaired += ride_posts.bulk_write(repairs, ordered=False).modified_count
+            repairs = []
+        if len(markers) >= 1000:
+            ride_posts.bulk_write(markers, ordered=False)
+            markers = []
+        
+        actual = actual_counts.get(ride['_id'], 0)
+        seats_remaining = max(ride.get('availableSeats', 0) - actual, 0)
+        # A missing counter matches None, so rides without counters are repaired too
+        unchanged = {'_id': ride['_id'], 'interestCount': ride.get('interestCount'), 'seatsRemaining': ride.get('seatsRemaining')}
+        
+        if ride.get('interestCount') == actual and ride.get('seatsRemaining') == seats_remaining:
+            if 'counterDrift' in ride:
+                markers.append(UpdateOne({'_id': ride['_id']}, {'$unset': {'counterDrift': ''}}))
+            continue
+        
+        if settle_seconds:
+            drift = ride.get('counterDrift') or {}
+            observed = {'interestCount': ride.get('interestCount'), 'seatsRemaining': ride.get('seatsRemaining'), 'actual': actual}
+            if {key: drift.get(key) for key in observed} != observed:
+                markers.append(UpdateOne(unchanged, {'$set': {'counterDrift': dict(observed, seenAt=now)}}))
+                continue
+            if now - drift['seenAt'] < timedelta(seconds=settle_seconds):
+                continue
+        
+        repairs.append(UpdateOne(unchanged, {
+            '$set': {'interestCount': actual, 'seatsRemaining': seats_remaining},
+            '$unset': {'counterDrift': ''}
+        }))
+    
+    if repairs:
+        repaired += ride_posts.bulk_write(repairs, ordered=False).modified_count
+    if markers:
+        ride_posts.bulk_write(markers, ordered=False)
+    
+    return repaired
+
 def calculate_ride_score(ride, search_criteria):
-    """Calculate a comprehensive score for ride matching"""
-    score = 0.0
+    """Calculate a comprehensive score for ride matching
     
+    Scalar reference for the batched ranking in rank_ride_ids and
+    search_rides_page; tests/test_batch_scoring.py checks they agree.
+    """
     # Location matching (50% weight) - intelligent city-level matching
     location_score = calculate_location_match_score(ride, search_criteria)
-    score += location_score * 0.5
+    return location_score * 0.5 + calculate_base_score(ride, search_criteria)
+
+def calculate_base_score(ride, search_criteria):
+    """Score every ride factor except location (worth at most 0.5)
+    
+    This part needs no location lookups, so search ranking uses it to bound
+    a ride's final score between base and base + 0.5 before matching locations.
+    """
+    score = 0.0
     
     # Time overlap (30% weight) - only if time preferences are provided
     if search_criteria.get('preferredStartTime') and search_criteria.get('preferredEndTime'):
@@ -109,8 +286,7 @@ def calculate_ride_score(ride, search_criteria):
     score += seat_score * 0.1
     
     # Popularity bonus (5% weight)
-    ride_interests = get_collection('ride_interests')
-    interest_count = ride_interests.count_documents({'rideId': ride['_id']})
+    interest_count = ride.get('interestCount', 0)
     popularity_score = min(interest_count / 5.0, 1.0)  # Cap at 5 interests
     score += popularity_score * 0.05
     
@@ -132,7 +308,10 @@ def calculate_ride_score(ride, search_criteria):
     return score
 
 def has_time_overlap(driver_start_time, driver_end_time, rider_start_time, rider_end_time):
-    """Check if two time ranges have any overlap"""
+    """Check if two time ranges have any overlap
+    
+    Scalar reference for batch_scoring.batch_time_overlap_mask.
+    """
     # Convert time strings to minutes for easier comparison
     def time_to_minutes(time_str):
         hours, minutes = map(int, time_str.split(':'))
@@ -146,15 +325,16 @@ def has_time_overlap(driver_start_time, driver_end_time, rider_start_time, rider
     # Two ranges overlap if: start1 <= end2 AND start2 <= end1
     return driver_start_min <= rider_end_min and rider_start_min <= driver_end_min
 
-def search_rides_with_scoring(search_criteria, user_id=None):
-    """Search for rides and apply intelligent scoring with city-level matching"""
+def iter_candidate_rides(search_criteria, user_id=None):
+    """Yield active rides matching the search filters, streamed from the cursor
+    
+    Callers score the rides with batch_score_rides, whose mask repeats the
+    time-overlap check pushed into the query here.
+    """
     ride_posts = get_collection('ride_posts')
     
-    # Base query
-    base_query = {
-        'status': 'active',
-        'seatsRemaining': {'$gt': 0}
-    }
+    # Base query; matches the partial indexes' filter so they can be used
+    base_query = dict(HOT_RIDES_FILTER)
     
     # Add travel date filter only if provided
     if search_criteria.get('travelDate'):
@@ -166,27 +346,21 @@ def search_rides_with_scoring(search_criteria, user_id=None):
         from bson import ObjectId
         base_query['userId'] = {'$ne': ObjectId(user_id)}
     
-    # Build intelligent location filters
-    location_filters = {}
-    
+    # City-level location matching: an equality seek on the stored route keys
     if search_criteria.get('startingFrom'):
-        starting_variations = get_location_variations(search_criteria['startingFrom'])
-        if starting_variations:
-            location_filters['startingFrom'] = {'$in': starting_variations}
+        base_query['originCityKey'] = location_service.get_location_key(search_criteria['startingFrom'])['cityKey']
     
     if search_criteria.get('goingTo'):
-        destination_variations = get_location_variations(search_criteria['goingTo'])
-        if destination_variations:
-            location_filters['goingTo'] = {'$in': destination_variations}
+        base_query['destinationCityKey'] = location_service.get_location_key(search_criteria['goingTo'])['cityKey']
     
-    # Combine base query with location filters
-    if location_filters:
-        base_query.update(location_filters)
-    
-    potential_rides = list(ride_posts.find(base_query))
+    # Push the time overlap predicate (start <= riderEnd && riderStart <= end) into Mongo
+    if search_criteria.get('preferredStartTime') and search_criteria.get('preferredEndTime'):
+        base_query['departureStartMinutes'] = {'$lte': time_to_minutes(search_criteria['preferredEndTime'])}
+        base_query['departureEndMinutes'] = {'$gte': time_to_minutes(search_criteria['preferredStartTime'])}
     
-    # If user is authenticated, exclude rides they've already expressed interest in AND their own rides
-    if user_id and potential_rides:
+    # If user is authenticated, exclude rides they've already expressed interest in
+    interested_ride_ids = set()
+    if user_id:
         from bson import ObjectId
         ride_interests = get_collection('ride_interests')
         
@@ -197,79 +371,212 @@ def search_rides_with_scoring(search_criteria, user_id=None):
         }, {'rideId': 1})
         
         interested_ride_ids = {str(interest['rideId']) for interest in user_interested_rides}
-        
+    
+    for ride in ride_posts.find(base_query):
         # Filter out rides user has already expressed interest in AND user's own rides
-        potential_rides = [
-            ride for ride in potential_rides 
-            if str(ride['_id']) not in interested_ride_ids and str(ride['userId']) != str(user_id)
-        ]
-    
-    scored_rides = []
-    
-    # Check if user provided time preferences
-    has_time_preferences = (search_criteria.get('preferredStartTime') and 
-                           search_criteria.get('preferredEndTime'))
-    
-    for ride in potential_rides:
-        # If user specified time preferences, filter out rides with zero overlap
-        if has_time_preferences:
-            if not has_time_overlap(
-                ride['departureStartTime'],
-                ride['departureEndTime'],
-                search_criteria['preferredStartTime'],
-                search_criteria['preferredEndTime']
-            ):
+        if user_id and (str(ride['_id']) in interested_ride_ids or str(ride['userId']) == str(user_id)):
+            continue
+        
+        yield ride
+
+def rank_ride_ids(search_criteria):
+    """Score every ride matching the criteria, before any per-user filtering
+    
+    Returns [score, rideId, driverId] entries, best first, with each score
+    equal to calculate_ride_score. This is what ride_search_cache stores.
+    """
+    ranked = []
+    
+    def rank_batch(batch):
+        mask, base_scores = batch_score_rides(batch, search_criteria)
+        for ride, keep, base_score in zip(batch, mask.tolist(), base_scores.tolist()):
+            if not keep:
                 continue  # Skip rides with no time overlap
+            score = calculate_location_match_score(ride, search_criteria) * 0.5 + base_score
+            if score > 0.1:  # Only include rides with meaningful scores
+                ranked.append([score, str(ride['_id']), str(ride['userId'])])
+    
+    batch = []
+    for ride in iter_candidate_rides(search_criteria):
+        batch.append(ride)
+        if len(batch) >= SCORING_BATCH_SIZE:
+            rank_batch(batch)
+            batch = []
+    if batch:
+        rank_batch(batch)
+    
+    # Stable sort keeps cursor order for ties
+    ranked.sort(key=lambda entry: entry[0], reverse=True)
+    return ranked
+
+def search_rides_page(search_criteria, user_id=None, page=1, per_page=10):
+    """Rank matching rides and return only the requested page
+    
+    Cacheable searches (origin and destination given) read the ranking from
+    ride_search_cache and only apply the per-user filters here. Otherwise
+    candidates are filtered and base-scored with NumPy in batches, then a
+    bounded min-heap keeps the page * per_page best rides instead of sorting
+    every match. A ride whose upper-bound score (base score plus the maximum
+    location score) cannot beat the heap's worst entry skips location
+    matching entirely. Ordering is identical to rank_ride_ids.
+    
+    Returns (rides_on_page, total_matching_rides).
+    """
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    
+    if ride_search_cache.cacheable(search_criteria):
+        return _search_rides_page_cached(search_criteria, user_id, page, per_page)
+    
+    top_k = page * per_page
+    heap = []
+    total = 0
+    index = 0
+    
+    def rank_batch(batch):
+        nonlocal total, index
+        mask, base_scores = batch_score_rides(batch, search_criteria)
         
-        score = calculate_ride_score(ride, search_criteria)
-        if score > 0.1:  # Only include rides with meaningful scores
+        for ride, keep, base_score in zip(batch, mask.tolist(), base_scores.tolist()):
+            index += 1
+            if not keep:
+                continue  # Skip rides with no time overlap
+            
+            # Cannot reach the page - only its contribution to the total matters
+            if len(heap) >= top_k and base_score + 0.5 <= heap[0][0]:
+                if base_score > 0.1:
+                    total += 1
+                    continue
+            
+            score = calculate_location_match_score(ride, search_criteria) * 0.5 + base_score
+            if score <= 0.1:  # Only include rides with meaningful scores
+                continue
+            
+            total += 1
             ride['matchScore'] = score
-            scored_rides.append(ride)
+            # Earlier rides win ties, matching the stable sort in rank_ride_ids
+            entry = (score, -index, ride)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+    
+    batch = []
+    for ride in iter_candidate_rides(search_criteria, user_id):
+        batch.append(ride)
+        if len(batch) >= SCORING_BATCH_SIZE:
+            rank_batch(batch)
+            batch = []
+    if batch:
+        rank_batch(batch)
+    
+    ranked = [entry[2] for entry in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+    start_idx = (page - 1) * per_page
+    return ranked[start_idx:start_idx + per_page], total
+
+def _search_rides_page_cached(search_criteria, user_id, page, per_page):
+    """search_rides_page over the cached ranking
+    
+    A ranking can still list rides that filled up, expired or were archived
+    since it was computed (another process may not have invalidated it yet).
+    When the page fetch comes back short, the ranking is invalidated and
+    recomputed once, so the total counts the same rides the pages show.
+    """
+    from bson import ObjectId
+    
+    # Per-user filtering: the user's own rides and rides they are already interested in
+    interested_ride_ids = set()
+    if user_id:
+        interested_ride_ids = {
+            str(interest['rideId'])
+            for interest in get_collection('ride_interests').find(
+                {'interestedUserId': ObjectId(user_id), 'status': 'interested'},
+                {'rideId': 1}
+            )
+        }
+    
+    start_idx = (page - 1) * per_page
+    for attempt in range(2):
+        ranked = ride_search_cache.get_or_compute(search_criteria, lambda: rank_ride_ids(search_criteria))
+        if user_id:
+            ranked = [
+                entry for entry in ranked
+                if entry[2] != str(user_id) and entry[1] not in interested_ride_ids
+            ]
+        
+        page_entries = ranked[start_idx:start_idx + per_page]
+        if not page_entries:
+            return [], len(ranked)
+        
+        rides_by_id = {
+            str(ride['_id']): ride
+            for ride in get_collection('ride_posts').find({
+                '_id': {'$in': [ObjectId(entry[1]) for entry in page_entries]},
+                **HOT_RIDES_FILTER
+            })
+        }
+        missing = sum(1 for entry in page_entries if entry[1] not in rides_by_id)
+        if not missing or attempt:
+            break
+        ride_search_cache.invalidate_search(search_criteria)
+    
+    rides = []
+    for score, ride_id, _ in page_entries:
+        ride = rides_by_id.get(ride_id)
+        if ride:
+            ride['matchScore'] = score
+            rides.append(ride)
+    # Rides that went away while recomputing are left out of the total too
+    return rides, len(ranked) - missing
+
+def list_active_rides(filters, cursor=None, limit=DEFAULT_RIDES_LIMIT, fields=None):
+    """Get one page of active rides with seats left, newest first
+    
+    filters may contain travelDateFrom / travelDateTo ("YYYY-MM-DD",
+    inclusive), startingFrom and goingTo (matched like search). fields limits
+    the projection to a subset of RIDE_LIST_FIELDS. Uses keyset pagination on
+    (createdAt, _id); returns (rides, next_cursor).
+    """
+    ride_posts = get_collection('ride_posts')
+    limit = clamp_limit(limit, DEFAULT_RIDES_LIMIT, MAX_RIDES_LIMIT)
     
-    # Sort by match score (highest first)
-    scored_rides.sort(key=lambda x: x['matchScore'], reverse=True)
+    query = dict(HOT_RIDES_FILTER)
     
-    return scored_rides
-
-def get_location_variations(location_string):
-    """Get all possible variations of a location for intelligent matching"""
-    if not location_string:
-        return []
+    # travelDate is stored as "YYYY-MM-DD", so string comparison is date order
+    date_range = {}
+    if filters.get('travelDateFrom'):
+        date_range['$gte'] = filters['travelDateFrom']
+    if filters.get('travelDateTo'):
+        date_range['$lte'] = filters['travelDateTo']
+    if date_range:
+        query['travelDate'] = date_range
     
-    # Parse the location string
-    parsed = location_service.parse_location_string(location_string)
-    if not parsed:
-        # If parsing fails, return the original string for exact match
-        return [location_string]
+    if filters.get('startingFrom'):
+        query['originCityKey'] = location_service.get_location_key(filters['startingFrom'])['cityKey']
+    if filters.get('goingTo'):
+        query['destinationCityKey'] = location_service.get_location_key(filters['goingTo'])['cityKey']
     
-    variations = [location_string]  # Always include the original
+    if cursor:
+        query.update(keyset_filter(cursor))
     
-    # Get all display name variations for this city
-    try:
-        if parsed['city'] and parsed['state']:
-            city_variations = location_service.get_all_city_display_names(
-                parsed['city'], 
-                parsed['state']
-            )
-            variations.extend(city_variations)
-    except Exception as e:
-        print(f"Error getting location variations: {e}")
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_variations = []
-    for variation in variations:
-        if variation not in seen:
-            seen.add(variation)
-            unique_variations.append(variation)
-    
-    return unique_variations
+    selected = [field for field in (fields or RIDE_LIST_FIELDS) if field in RIDE_LIST_FIELDS]
+    # createdAt is needed to build the next cursor
+    projection = {field: 1 for field in selected + ['createdAt']}
+    
+    rides, next_cursor = keyset_page(ride_posts, query, limit, projection=projection)
+    if 'createdAt' not in selected:
+        for ride in rides:
+            ride.pop('createdAt', None)
+    
+    return rides, next_cursor
 
 def get_ride_with_details(ride_id):
-    """Get a ride with driver information and interest count using aggregation"""
-    ride_posts = get_collection('ride_posts')
+    """Get a ride with driver information and interest count using aggregation
+    
+    Falls back to ride_posts_archive for finished rides that were archived.
+    """
     
-    # Use aggregation to get ride, driver, and interest count
+    # Use aggregation to get ride and driver; interest count is stored on the ride
     pipeline = [
         {'$match': {'_id': ride_id}},
         {'$lookup': {
@@ -278,45 +585,63 @@ def get_ride_with_details(ride_id):
             'foreignField': '_id',
             'as': 'driver'
         }},
-        {'$lookup': {
-            'from': 'ride_interests',
-            'localField': '_id',
-            'foreignField': 'rideId',
-            'as': 'interests'
-        }},
-        {'$unwind': {'path': '$driver', 'preserveNullAndEmptyArrays': True}},
-        {'$addFields': {
-            'interestCount': {'$size': '$interests'},
-            'isHotRide': {'$gte': [{'$size': '$interests'}, 3]}
-        }}
+        {'$unwind': {'path': '$driver', 'preserveNullAndEmptyArrays': True}}
     ]
     
-    ride_details = list(ride_posts.aggregate(pipeline))
-    
-    if not ride_details:
+    for collection_name in ('ride_posts', 'ride_posts_archive'):
+        ride_details = list(get_collection(collection_name).aggregate(pipeline))
+        if ride_details:
+            break
+    else:
         return None
     
     ride_data = ride_details[0]
+    return format_ride_details(ride_data, ride_data.get('driver'))
+
+def hydrate_rides(rides):
+    """Format already-loaded ride documents with driver details in bulk
+    
+    Drivers for the whole batch are fetched with a single $in query and
+    interest counts come from each ride's stored interestCount, so a page
+    of rides costs one query regardless of its size.
+    """
+    if not rides:
+        return []
     
-    # Helper function to format location data
-    def format_location_field(location_value):
-        if not location_value:
-            return None
-        
-        # If it's already an object (from locations collection), use it
-        if isinstance(location_value, dict) and 'displayName' in location_value:
-            return location_value
-        
-        # If it's a string, create a location object
-        if isinstance(location_value, str):
-            return {
-                'displayName': location_value
-            }
-        
+    users = get_collection('users')
+    driver_ids = list({ride['userId'] for ride in rides})
+    drivers = {
+        driver['_id']: driver
+        for driver in users.find(
+            {'_id': {'$in': driver_ids}},
+            {'name': 1, 'phone': 1, 'whatsapp': 1}
+        )
+    }
+    
+    return [format_ride_details(ride, drivers.get(ride['userId'])) for ride in rides]
+
+def format_location_field(location_value):
+    """Format a ride location (display string or location object) for API response"""
+    if not location_value:
         return None
     
-    # Format the response
-    formatted_ride = {
+    # If it's already an object (from locations collection), use it
+    if isinstance(location_value, dict) and 'displayName' in location_value:
+        return location_value
+    
+    # If it's a string, create a location object
+    if isinstance(location_value, str):
+        return {
+            'displayName': location_value
+        }
+    
+    return None
+
+def format_ride_details(ride_data, driver):
+    """Format a ride document and its driver for API response"""
+    interest_count = ride_data.get('interestCount', 0)
+    
+    return {
         '_id': str(ride_data['_id']),
         'userId': str(ride_data['userId']),  # Include userId for filtering
         'startingFrom': format_location_field(ride_data.get('startingFrom')),
@@ -335,12 +660,11 @@ def get_ride_with_details(ride_id):
         'updatedAt': ride_data['updatedAt'],
         'additionalDetails': ride_data.get('additionalDetails', ''),
         'driver': {
-            'name': ride_data['driver']['name'],
-            'phoneNumber': ride_data['driver'].get('phone', ''),
-            'whatsappNumber': ride_data['driver'].get('whatsapp', '')
-        } if ride_data.get('driver') else None,
-        'interestCount': ride_data['interestCount'],
-        'isHotRide': ride_data['isHotRide']
+            'name': driver['name'],
+            'phoneNumber': driver.get('phone', ''),
+            'whatsappNumber': driver.get('whatsapp', '')
+        } if driver else None,
+        'interestCount': interest_count,
+        'isHotRide': interest_count >= 3,
+        'version': ride_data.get('version', 0)
     }
-    
-    return formatted_ride 
@@ -0,0 +1,223 @@
+import json
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from scripts.database import get_collection
+from services.location_service import location_service
+from utils.cache import TTLCache
+
+class MemorySearchCacheBackend:
+    """Per-process LRU of rankings with generations kept in Mongo
+
+    Entries stay in each process, but the generation counters live in the
+    ``ride_search_generations`` collection, so a bump made by any worker
+    makes every worker miss on its next lookup.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.cache = TTLCache('ride_search', max_size=max_size, ttl_seconds=ttl_seconds)
+
+    @property
+    def collection(self):
+        return get_collection('ride_search_generations')
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def generations(self, tags):
+        found = {doc['_id']: doc['generation'] for doc in self.collection.find({'_id': {'$in': list(tags)}})}
+        return [found.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne({'_id': tag}, {'$inc': {'generation': 1}, '$set': {'updatedAt': now}}, upsert=True)
+            for tag in tags
+        ], ordered=False)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+class RedisSearchCacheBackend:
+    """Redis backend shared by every process; generations live in Redis too"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = 'ride_search:'
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl_seconds, json.dumps(value))
+
+    def generations(self, tags):
+        values = self.client.mget([f'{self.prefix}gen:{tag}' for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags):
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(f'{self.prefix}gen:{tag}')
+        pipeline.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+    def stats(self):
+        return {'host': self.client.connection_pool.connection_kwargs.get('host')}
+
+class RideSearchCache:
+    """Caches the ranked (score, rideId, driverId) list for a search
+
+    Entries hold every scored candidate before per-user filtering, keyed by
+    the search criteria. Each key embeds the generation of its route tags:
+    (origin city, destination city, travel date) and (origin city,
+    destination city, any date). Changing a ride bumps the generations of
+    its own route tags, so exactly the searches that could include it miss
+    on their next lookup; entries for other routes are untouched.
+
+    RIDE_SEARCH_CACHE_BACKEND selects ``redis`` (entries shared across
+    processes; the default when REDIS_URL is set), ``memory`` (per-process
+    entries, generations in Mongo; the default otherwise) or ``off``.
+    Both backends share generations across processes, so an invalidation
+    is seen by every worker on its next lookup.
+    """
+
+    def __init__(self):
+        default_backend = 'redis' if os.getenv('REDIS_URL') else 'memory'
+        backend = os.getenv('RIDE_SEARCH_CACHE_BACKEND', default_backend).lower()
+        ttl_seconds = float(os.getenv('RIDE_SEARCH_CACHE_TTL_SECONDS', 300))
+        max_size = int(os.getenv('RIDE_SEARCH_CACHE_SIZE', 1024))
+
+        self.backend = None
+        if backend == 'redis':
+            try:
+                self.backend = RedisSearchCacheBackend(os.getenv('REDIS_URL', 'redis://localhost:6379/0'), ttl_seconds)
+            except ImportError:
+                print("redis package not installed, using in-process ride search cache")
+                backend = 'memory'
+        if backend == 'memory':
+            self.backend = MemorySearchCacheBackend(max_size, ttl_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def route_key(self, location_string) -> str:
+        return location_service.get_location_key(location_string)['cityKey']
+
+    def _travel_date(self, value):
+        if not value:
+            return '*'
+        return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+
+    def _tag(self, origin: str, destination: str, travel_date: str) -> str:
+        return f'{origin}>{destination}@{travel_date}'
+
+    def cacheable(self, search_criteria) -> bool:
+        """Only searches with both an origin and a destination are cached"""
+        return self.enabled and bool(search_criteria.get('startingFrom')) and bool(search_criteria.get('goingTo'))
+
+    def key(self, search_criteria):
+        """Cache key for a search, or None when the search is not cacheable"""
+        if not self.cacheable(search_criteria):
+            return None
+
+        origin = self.route_key(search_criteria['startingFrom'])
+        destination = self.route_key(search_criteria['goingTo'])
+        travel_date = self._travel_date(search_criteria.get('travelDate'))
+        generation = self.backend.generations([self._tag(origin, destination, travel_date)])[0]
+
+        # Raw strings are part of the key: scoring gives a verbatim match more
+        # than a city-level one, so differently spelled searches rank differently
+        return json.dumps([
+            search_criteria['startingFrom'],
+            search_criteria['goingTo'],
+            travel_date,
+            search_criteria.get('preferredStartTime') or '',
+            search_criteria.get('preferredEndTime') or '',
+            f'{origin}>{destination}',
+            str(generation)
+        ])
+
+    def get_or_compute(self, search_criteria, compute):
+        """Return the cached ranking for search_criteria, computing it on a miss"""
+        try:
+            key = self.key(search_criteria)
+            ranked = self.backend.get(key) if key else None
+        except Exception as e:
+            print(f"Ride search cache read failed: {e}")
+            return compute()
+        if key is None:
+            return compute()
+
+        if ranked is None:
+            ranked = compute()
+            try:
+                self.backend.set(key, ranked)
+            except Exception as e:
+                print(f"Ride search cache write failed: {e}")
+        return ranked
+
+    def invalidate_ride(self, *rides):
+        """Invalidate searches that could include these rides (pass before and after states on update)"""
+        if not self.enabled:
+            return
+
+        tags = set()
+        for ride in rides:
+            if not ride or not ride.get('startingFrom') or not ride.get('goingTo'):
+                continue
+            origin = self.route_key(ride['startingFrom'])
+            destination = self.route_key(ride['goingTo'])
+            # Searches for this date and searches without a date both include the ride
+            for travel_date in (self._travel_date(ride.get('travelDate')), '*'):
+                tags.add(self._tag(origin, destination, travel_date))
+
+        if tags:
+            try:
+                self.backend.bump(sorted(tags))
+            except Exception as e:
+                print(f"Ride search cache invalidation failed: {e}")
+
+    def invalidate_search(self, search_criteria):
+        """Invalidate the ranking cached for one search, e.g. after it listed rides that are gone"""
+        if not self.cacheable(search_criteria):
+            return
+
+        tag = self._tag(
+            self.route_key(search_criteria['startingFrom']),
+            self.route_key(search_criteria['goingTo']),
+            self._travel_date(search_criteria.get('travelDate'))
+        )
+        try:
+            self.backend.bump([tag])
+        except Exception as e:
+            print(f"Ride search cache invalidation failed: {e}")
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self):
+        if not self.enabled:
+            return {'backend': 'off'}
+        return dict(self.backend.stats(), backend=self.backend.name)
+
+# Global instance
+ride_search_cache = RideSearchCache()
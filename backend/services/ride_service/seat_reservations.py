@@ -0,0 +1,89 @@
+from pymongo import ReturnDocument
+from scripts.database import get_collection
+
+# Server-side retries for unversioned edits that lose a race
+MAX_UPDATE_ATTEMPTS = 3
+
+class RideVersionConflict(Exception):
+    """The ride changed since the version the client edited"""
+
+    def __init__(self, current_version: int):
+        super().__init__('Ride was modified by another request')
+        self.current_version = current_version
+
+def reserve_seat(ride_id, user_id):
+    """Take one seat on an active ride for user_id in a single conditional update
+
+    The seat is taken and the interest counted only if a seat is left, so
+    concurrent requests for the last seat cannot oversell it. Returns the
+    updated ride, or None if the ride is missing, inactive, full or owned
+    by user_id.
+    """
+    return get_collection('ride_posts').find_one_and_update(
+        {
+            '_id': ride_id,
+            'status': 'active',
+            'userId': {'$ne': user_id},
+            'seatsRemaining': {'$gt': 0}
+        },
+        {'$inc': {'seatsRemaining': -1, 'interestCount': 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def release_seat(ride_id):
+    """Give back a seat taken by reserve_seat; returns the updated ride or None"""
+    return get_collection('ride_posts').find_one_and_update(
+        {'_id': ride_id, 'interestCount': {'$gt': 0}},
+        {'$inc': {'seatsRemaining': 1, 'interestCount': -1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def update_ride_versioned(ride_id, user_id, update_data, expected_version=None):
+    """Apply an owner's edit with optimistic concurrency; returns (previous, updated)
+
+    Every edit increments the ride's ``version``. When expected_version is
+    given the edit only applies to that version, otherwise a lost race is
+    retried on fresh state. Seat reservations do not change the version:
+    a new availableSeats is applied as an $inc of seatsRemaining, guarded
+    so seats that are already reserved are never taken back.
+
+    Returns (None, None) if the ride does not exist or is not owned by
+    user_id. Raises RideVersionConflict, or ValueError when availableSeats
+    would drop below the seats already reserved.
+    """
+    ride_posts = get_collection('ride_posts')
+    update_data = dict(update_data)
+    if 'availableSeats' in update_data:
+        update_data['availableSeats'] = int(update_data['availableSeats'])
+
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        current = ride_posts.find_one({'_id': ride_id, 'userId': user_id})
+        if current is None:
+            return None, None
+
+        current_version = current.get('version', 0)
+        if expected_version is not None and int(expected_version) != current_version:
+            raise RideVersionConflict(current_version)
+
+        # A missing version matches None, so rides created before versioning work too
+        query = {'_id': ride_id, 'userId': user_id, 'version': current.get('version')}
+        update = {'$set': update_data, '$inc': {'version': 1}}
+
+        seat_delta = update_data.get('availableSeats', current['availableSeats']) - current['availableSeats']
+        if seat_delta < 0:
+            if current['seatsRemaining'] < -seat_delta:
+                reserved = current['availableSeats'] - current['seatsRemaining']
+                raise ValueError(f'Cannot reduce seats below the {reserved} already reserved')
+            query['seatsRemaining'] = {'$gte': -seat_delta}
+        if seat_delta:
+            update['$inc']['seatsRemaining'] = seat_delta
+
+        updated = ride_posts.find_one_and_update(query, update, return_document=ReturnDocument.AFTER)
+        if updated is not None:
+            return current, updated
+        if expected_version is not None:
+            latest = ride_posts.find_one({'_id': ride_id}, {'version': 1}) or {}
+            if latest.get('version', 0) != current_version:
+                raise RideVersionConflict(latest.get('version', 0))
+
+    raise RideVersionConflict(current_version)
@@ -0,0 +1,17 @@
+import os
+from functools import partial
+from .scheduler import job_scheduler, JobScheduler
+from services.ride_service import expire_past_rides, archive_finished_rides, reconcile_interest_counts
+from services.notification_service import prune_read_notifications, reconcile_unread_counts
+
+# Maintenance jobs and how often the leader runs them (seconds)
+job_scheduler.add_job('expire_past_rides', expire_past_rides, int(os.getenv('EXPIRE_RIDES_INTERVAL_SECONDS', 3600)))
+job_scheduler.add_job('archive_finished_rides', archive_finished_rides, int(os.getenv('ARCHIVE_RIDES_INTERVAL_SECONDS', 86400)))
+job_scheduler.add_job('prune_read_notifications', prune_read_notifications, int(os.getenv('PRUNE_NOTIFICATIONS_INTERVAL_SECONDS', 86400)))
+job_scheduler.add_job('reconcile_unread_counts', reconcile_unread_counts, int(os.getenv('RECONCILE_UNREAD_INTERVAL_SECONDS', 3600)))
+# Drift must persist for RECONCILE_SETTLE_SECONDS so in-flight interest requests are not "repaired"
+job_scheduler.add_job(
+    'reconcile_interest_counts',
+    partial(reconcile_interest_counts, settle_seconds=int(os.getenv('RECONCILE_SETTLE_SECONDS', 300))),
+    int(os.getenv('RECONCILE_INTEREST_INTERVAL_SECONDS', 3600))
+)
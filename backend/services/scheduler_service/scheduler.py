@@ -0,0 +1,163 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from scripts.database import get_collection
+
+class JobScheduler:
+    """Runs periodic maintenance jobs in exactly one process at a time.
+
+    Every process starts a daemon thread that wakes every
+    SCHEDULER_TICK_SECONDS and tries to take or renew a lease on the
+    ``scheduler_locks`` document. Only the lease holder runs jobs; if it
+    dies, another process takes over once SCHEDULER_LEASE_SECONDS pass.
+    Each job's last run is recorded in ``scheduler_jobs``, so a new leader
+    continues the schedule instead of re-running everything. Jobs must be
+    idempotent: a job that outlives the lease may briefly overlap with the
+    next leader's run.
+    """
+
+    LOCK_ID = 'job-scheduler'
+
+    def __init__(self):
+        self.enabled = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+        self.tick_seconds = float(os.getenv('SCHEDULER_TICK_SECONDS', 30))
+        self.lease_seconds = float(os.getenv('SCHEDULER_LEASE_SECONDS', 120))
+        self.jobs = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.is_leader = False
+
+    def add_job(self, name: str, func, interval_seconds: float):
+        """Register func to run every interval_seconds on the leader"""
+        self.jobs[name] = {'func': func, 'interval': interval_seconds}
+
+    @property
+    def owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        """Start this process's scheduler thread if it is not running"""
+        pid = os.getpid()
+        if not self.enabled or self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            # Threads never survive a fork, so each process runs its own
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = pid
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
+        self._release_lease()
+
+    def acquire_lease(self) -> bool:
+        """Take the leader lease if it is free or expired, or renew our own"""
+        now = datetime.utcnow()
+        try:
+            lock = get_collection('scheduler_locks').find_one_and_update(
+                {'_id': self.LOCK_ID, '$or': [{'owner': self.owner}, {'expiresAt': {'$lte': now}}]},
+                {'$set': {'owner': self.owner, 'expiresAt': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self.is_leader = lock is not None
+        except DuplicateKeyError:
+            # The lock exists and is held by a live process
+            self.is_leader = False
+        return self.is_leader
+
+    def _release_lease(self):
+        if not self.is_leader:
+            return
+        try:
+            get_collection('scheduler_locks').delete_one({'_id': self.LOCK_ID, 'owner': self.owner})
+        except PyMongoError as e:
+            print(f"Could not release scheduler lease: {e}")
+        self.is_leader = False
+
+    def due_jobs(self):
+        """Names of jobs whose interval has elapsed since their last recorded run"""
+        now = datetime.utcnow()
+        last_runs = {
+            job['_id']: job.get('lastRunAt')
+            for job in get_collection('scheduler_jobs').find({'_id': {'$in': list(self.jobs)}}, {'lastRunAt': 1})
+        }
+        return [
+            name for name, job in self.jobs.items()
+            if not last_runs.get(name) or now - last_runs[name] >= timedelta(seconds=job['interval'])
+        ]
+
+    def run_job(self, name: str):
+        """Run one job now and record its outcome; returns the job's result"""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self.jobs[name]['func']()
+            print(f"Scheduled job {name} finished: {result}")
+        except Exception as e:
+            error = str(e)
+            print(f"Scheduled job {name} failed: {e}")
+            traceback.print_exc()
+
+        get_collection('scheduler_jobs').update_one(
+            {'_id': name},
+            {'$set': {
+                'lastRunAt': started_at,
+                'lastDurationMs': round((time.perf_counter() - started) * 1000, 1),
+                'lastResult': result,
+                'lastError': error,
+                'lastOwner': self.owner
+            }},
+            upsert=True
+        )
+        return result
+
+    def tick(self):
+        """Run every due job if this process holds the lease"""
+        if not self.acquire_lease():
+            return
+        for name in self.due_jobs():
+            if self._stop.is_set() or not self.acquire_lease():
+                return
+            self.run_job(name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Job scheduler error: {e}")
+                traceback.print_exc()
+            self._stop.wait(self.tick_seconds)
+
+    def get_stats(self):
+        lock = get_collection('scheduler_locks').find_one({'_id': self.LOCK_ID}) or {}
+        return {
+            'enabled': self.enabled,
+            'running': self._pid == os.getpid(),
+            'leader': lock.get('owner'),
+            'leaseExpiresAt': lock.get('expiresAt'),
+            'jobs': {
+                job['_id']: {key: value for key, value in job.items() if key != '_id'}
+                for job in get_collection('scheduler_jobs').find({'_id': {'$in': list(self.jobs)}})
+            }
+        }
+
+# Global instance
+job_scheduler = JobScheduler()
@@ -0,0 +1,159 @@
+import bisect
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is saturated; routes answer 429"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__('Password hashing is busy, please retry shortly')
+        self.retry_after = retry_after
+
+# Run in the worker processes, so they must be importable module-level functions
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed millisecond buckets"""
+
+    BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+            self.count += 1
+            self.sum_ms += elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            buckets, running = {}, 0
+            for bound, count in zip(self.BUCKETS_MS + ('+Inf',), self.counts):
+                running += count
+                buckets[f'le_{bound}'] = running
+            return {
+                'count': self.count,
+                'sumMs': round(self.sum_ms, 2),
+                'avgMs': round(self.sum_ms / self.count, 2) if self.count else 0.0,
+                'buckets': buckets
+            }
+
+class PasswordHasher:
+    """Runs bcrypt off the request thread in a process pool.
+
+    bcrypt is CPU-bound (hundreds of milliseconds at the default cost), so
+    hashing and verification are sent to PASSWORD_HASH_WORKERS processes
+    (default: the cores divided among the WEB_CONCURRENCY web workers, so
+    the pools of all web workers together do not oversubscribe the CPU).
+    At most PASSWORD_HASH_MAX_PENDING operations may be running or queued
+    per web process; past that, callers get PasswordHasherBusy immediately
+    instead of piling up behind the pool. A request that gives up after
+    PASSWORD_HASH_TIMEOUT_SECONDS cancels its task if it has not started;
+    a task already running keeps its slot until it finishes.
+    BCRYPT_ROUNDS sets the cost factor for new hashes, and needs_rehash()
+    reports stored hashes made with a different cost. Setting
+    PASSWORD_HASH_WORKERS=0 hashes inline (development).
+    """
+
+    def __init__(self):
+        self.rounds = int(os.getenv('BCRYPT_ROUNDS', 12))
+        web_workers = max(int(os.getenv('WEB_CONCURRENCY', 1)), 1)
+        self.workers = int(os.getenv('PASSWORD_HASH_WORKERS', max((os.cpu_count() or 1) // web_workers, 1)))
+        self.max_pending = int(os.getenv('PASSWORD_HASH_MAX_PENDING', max(self.workers, 1) * 4))
+        self.timeout_seconds = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.rejected = 0
+        self.timed_out = 0
+        self.histograms = {'hash': LatencyHistogram(), 'verify': LatencyHistogram()}
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Pools never survive a fork, so each web worker starts its own.
+                    # Spawned children avoid inheriting the app's threads and sockets.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = pid
+        return self._executor
+
+    def _run(self, operation: str, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                try:
+                    return fn(*args)
+                finally:
+                    self._slots.release()
+
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is freed when the task is done or cancelled, not when this request stops waiting
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(timeout=self.timeout_seconds)
+            except FutureTimeoutError:
+                # A queued task is dropped; one already running finishes in the pool
+                future.cancel()
+                with self._lock:
+                    self.timed_out += 1
+                raise PasswordHasherBusy()
+        finally:
+            self.histograms[operation].observe((time.perf_counter() - started) * 1000)
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password with the configured cost factor"""
+        return self._run('hash', _hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def verify_password(self, password: str, hashed: str) -> bool:
+        """Check a password against a stored bcrypt hash"""
+        return self._run('verify', _check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when a stored hash was made with a different cost factor"""
+        try:
+            # Format: $2b$<rounds>$<salt+hash>
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            rejected, timed_out = self.rejected, self.timed_out
+        return {
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'maxPending': self.max_pending,
+            'rejected': rejected,
+            'timedOut': timed_out,
+            'latency': {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        }
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -1,12 +1,24 @@
-import bcrypt
 from bson import ObjectId
 from typing import Optional, Dict
 from datetime import datetime
 from scripts.database import get_collection
+from utils.cache import TTLCache
+from services.ride_service.search_cache import ride_search_cache
+from services.user_service.password_hasher import password_hasher, PasswordHasherBusy
+import os
 
 class UserService:
     def __init__(self):
-        self.users = get_collection('users')
+        # Short-lived user_id -> formatted user cache for request authentication
+        self.auth_user_cache = TTLCache(
+            'auth_users',
+            max_size=int(os.getenv('AUTH_CACHE_SIZE', 4096)),
+            ttl_seconds=int(os.getenv('AUTH_CACHE_TTL_SECONDS', 60))
+        )
+    
+    @property
+    def users(self):
+        return get_collection('users')
     
     def create_user(self, username: str, email: str, password: str, name: str, phone: str, whatsapp: str) -> Dict:
         """Create a new user with username/password and required contact info"""
@@ -45,13 +57,13 @@ class UserService:
 
         
         # Hash the password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash_password(password)
         
         user = {
             "username": username,
             "email": email,
             "name": name,
-            "password": hashed_password.decode('utf-8'),
+            "password": hashed_password,
             "phone": phone.strip(),
             "whatsapp": whatsapp.strip(),
             "createdAt": datetime.utcnow(),
@@ -68,15 +80,44 @@ class UserService:
         if not user:
             return None
         
-        if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-            return self._format_user(user)
-        return None
+        if not password_hasher.verify_password(password, user['password']):
+            return None
+        
+        if password_hasher.needs_rehash(user['password']):
+            self._rehash_password(user, password)
+        return self._format_user(user)
+    
+    def _rehash_password(self, user: Dict, password: str):
+        """Re-hash a verified password after the bcrypt cost setting changed"""
+        try:
+            new_hash = password_hasher.hash_password(password)
+        except PasswordHasherBusy:
+            # Not worth failing a login over; the next login retries
+            return
+        # Only replace the hash that was verified, in case the password changed meanwhile
+        self.users.update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": new_hash}}
+        )
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         user = self.users.find_one({"_id": ObjectId(user_id)})
         return self._format_user(user) if user else None
     
+    def get_authenticated_user(self, user_id: str) -> Optional[Dict]:
+        """Get user by ID for request authentication, served from a short-TTL cache"""
+        user = self.auth_user_cache.get(user_id)
+        if user is None:
+            user = self.get_user_by_id(user_id)
+            if user:
+                self.auth_user_cache.set(user_id, user)
+        return dict(user) if user else None
+    
+    def invalidate_user_cache(self, user_id: str):
+        """Drop a user from the authentication cache after it changes"""
+        self.auth_user_cache.delete(str(user_id))
+    
     def update_user(self, user_id: str, updates: Dict) -> Optional[Dict]:
         """Update user profile"""
         # Remove sensitive fields from updates
@@ -89,6 +130,7 @@ class UserService:
             {"_id": ObjectId(user_id)},
             {"$set": updates}
         )
+        self.invalidate_user_cache(user_id)
         
         if result.modified_count > 0:
             return self.get_user_by_id(user_id)
@@ -105,10 +147,26 @@ class UserService:
             notifications = get_collection('notifications')
             
             # Delete all ride posts created by this user
+            route_fields = {"startingFrom": 1, "goingTo": 1, "travelDate": 1}
+            owned_rides = list(ride_posts.find({"userId": user_object_id}, route_fields))
             ride_posts.delete_many({"userId": user_object_id})
+            ride_search_cache.invalidate_ride(*owned_rides)
+            
+            # Delete all ride interests by this user, releasing their seats
+            interested_ride_ids = ride_interests.distinct("rideId", {"interestedUserId": user_object_id})
+            ride_interests.delete_many({"interestedUserId": user_object_id})
+            if interested_ride_ids:
+                ride_posts.update_many(
+                    {"_id": {"$in": interested_ride_ids}, "interestCount": {"$gt": 0}},
+                    {"$inc": {"interestCount": -1, "seatsRemaining": 1}}
+                )
+                ride_search_cache.invalidate_ride(
+                    *ride_posts.find({"_id": {"$in": interested_ride_ids}}, route_fields)
+                )
             
-            # Delete all ride interests by this user
-            ride_interests.delete_many({"userId": user_object_id})
+            # Archived rides and interests belong to the user too
+            get_collection('ride_posts_archive').delete_many({"userId": user_object_id})
+            get_collection('ride_interests_archive').delete_many({"interestedUserId": user_object_id})
             
             # Delete all notifications for this user
             notifications.delete_many({"userId": user_object_id})
@@ -116,8 +174,12 @@ class UserService:
             # Delete all notifications created because of this user's actions
             notifications.delete_many({"triggeredBy": user_object_id})
             
+            # Drop the user's materialized unread counter
+            get_collection('notification_counters').delete_one({"_id": user_object_id})
+            
             # Finally, delete the user account
             result = self.users.delete_one({"_id": user_object_id})
+            self.invalidate_user_cache(user_id)
             
             return result.deleted_count > 0
             
@@ -172,17 +234,17 @@ class UserService:
                 return {"success": False, "error": "User not found"}
             
             # Check if new password is same as current password
-            if bcrypt.checkpw(new_password.encode('utf-8'), user['password'].encode('utf-8')):
+            if password_hasher.verify_password(new_password, user['password']):
                 return {"success": False, "error": "New password must be different from your current password"}
             
             # Hash the new password
-            hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+            hashed_password = password_hasher.hash_password(new_password)
             
             # Update password and clear reset code
             result = self.users.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": {
-                    "password": hashed_password.decode('utf-8'),
+                    "password": hashed_password,
                     "updatedAt": datetime.utcnow()
                 },
                 "$unset": {
@@ -196,6 +258,8 @@ class UserService:
             else:
                 return {"success": False, "error": "Failed to update password"}
                 
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             print(f"Error resetting password: {str(e)}")
             return {"success": False, "error": "Failed to reset password"}
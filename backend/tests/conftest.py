@@ -0,0 +1,41 @@
+import os
+
+# Settings must be in place before any service module reads them at import time
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+os.environ.setdefault('CORS_ORIGINS', 'http://localhost:3000')
+os.environ.setdefault('EMAIL_ENABLED', 'false')
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+import mongomock
+import pytest
+from scripts import database
+
+_client = mongomock.MongoClient()
+database.connection_manager.get_client = lambda: _client
+
+@pytest.fixture
+def db():
+    """The mongomock database behind get_collection, emptied after each test"""
+    yield _client[database.DATABASE_NAME]
+    _client.drop_database(database.DATABASE_NAME)
+
+@pytest.fixture
+def client(db):
+    from app import app
+    return app.test_client()
+
+@pytest.fixture
+def user_token(db):
+    """(user_id, session JWT) for a user inserted straight into the users collection"""
+    from datetime import datetime
+    from app import app
+    from utils.auth_helpers import create_jwt_token
+    now = datetime.utcnow()
+    user_id = db.users.insert_one({
+        'username': 'rider', 'email': 'rider@example.com', 'name': 'Rider',
+        'password': 'not-a-real-hash', 'createdAt': now, 'updatedAt': now
+    }).inserted_id
+    with app.app_context():
+        return user_id, create_jwt_token(user_id)
@@ -0,0 +1,196 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from bson import ObjectId
+from services.ride_service.batch_scoring import batch_score_rides
+from services.ride_service.ride_matching import (
+    calculate_base_score, calculate_location_match_score, calculate_ride_score,
+    get_departure_minutes, get_route_keys, has_time_overlap, rank_ride_ids
+)
+
+CITIES = ['State College, Pennsylvania', 'Boston, Massachusetts', 'New York, New York']
+ZIPS = {'State College, Pennsylvania': ['16801', '16803'], 'Boston, Massachusetts': ['02108'], 'New York, New York': ['10001']}
+
+def minutes_to_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+def days_from_today(days):
+    return (datetime.now().date() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+def make_ride(start, end, seats=4, remaining=4, interests=0, travel_date=None, origin=CITIES[0], destination=CITIES[1], minute_fields=True):
+    ride = {
+        '_id': ObjectId(),
+        'userId': ObjectId(),
+        'startingFrom': origin,
+        'goingTo': destination,
+        'travelDate': travel_date or days_from_today(3),
+        'departureStartTime': start,
+        'departureEndTime': end,
+        'availableSeats': seats,
+        'seatsRemaining': remaining,
+        'interestCount': interests,
+        'status': 'active'
+    }
+    ride.update(get_route_keys(ride))
+    if minute_fields:
+        ride.update(get_departure_minutes(ride))
+    return ride
+
+def random_location(rng):
+    city = rng.choice(CITIES)
+    # Mix city-level and ZIP-specific display names so both 1.0 and 0.9 matches occur
+    return city if rng.random() < 0.5 else f'{city} {rng.choice(ZIPS[city])}'
+
+def random_ride(rng):
+    start = rng.randrange(0, 24 * 60)
+    end = rng.randrange(0, 24 * 60)  # Sometimes before start
+    seats = rng.randint(1, 6)
+    return make_ride(
+        minutes_to_time(start),
+        minutes_to_time(end),
+        seats=seats,
+        remaining=rng.randint(0, seats),
+        interests=rng.randint(0, 8),
+        travel_date=rng.choice([days_from_today(rng.randint(-5, 60)), 'not-a-date', (datetime.now().date() + timedelta(days=rng.randint(0, 40)))]),
+        origin=random_location(rng),
+        destination=random_location(rng),
+        minute_fields=rng.random() < 0.8
+    )
+
+def random_criteria(rng):
+    criteria = {'startingFrom': random_location(rng), 'goingTo': random_location(rng)}
+    window = rng.random()
+    if window < 0.7:
+        criteria['preferredStartTime'] = minutes_to_time(rng.randrange(0, 24 * 60))
+        criteria['preferredEndTime'] = minutes_to_time(rng.randrange(0, 24 * 60))
+    elif window < 0.85:
+        criteria['preferredStartTime'] = minutes_to_time(rng.randrange(0, 24 * 60))
+    return criteria
+
+def assert_parity(rides, criteria):
+    mask, base_scores = batch_score_rides(rides, criteria)
+    has_window = criteria.get('preferredStartTime') and criteria.get('preferredEndTime')
+    for ride, keep, base_score in zip(rides, mask.tolist(), base_scores.tolist()):
+        expected_keep = not has_window or has_time_overlap(
+            ride['departureStartTime'], ride['departureEndTime'],
+            criteria['preferredStartTime'], criteria['preferredEndTime']
+        )
+        assert keep == expected_keep, (ride, criteria)
+        assert base_score == calculate_base_score(ride, criteria), (ride, criteria)
+        location_score = calculate_location_match_score(ride, criteria)
+        assert location_score * 0.5 + base_score == calculate_ride_score(ride, criteria), (ride, criteria)
+
+@pytest.mark.parametrize('ride_window, rider_window', [
+    (('08:00', '10:00'), ('10:00', '12:00')),  # Touching at the end
+    (('10:00', '12:00'), ('08:00', '10:00')),  # Touching at the start
+    (('08:00', '10:00'), ('10:01', '12:00')),  # One minute apart
+    (('09:00', '09:00'), ('08:00', '10:00')),  # Zero-length ride window
+    (('08:00', '10:00'), ('09:00', '09:00')),  # Zero-length rider window
+    (('08:00', '10:00'), ('08:00', '10:00')),  # Identical
+    (('00:00', '23:59'), ('12:00', '12:30')),  # Whole day
+    (('23:00', '01:00'), ('22:00', '23:30')),  # Ride window wraps midnight
+    (('22:00', '23:30'), ('23:00', '01:00')),  # Rider window wraps midnight
+    (('23:00', '01:00'), ('23:30', '00:30')),  # Both wrap
+])
+def test_time_window_boundaries(ride_window, rider_window):
+    rides = [make_ride(*ride_window), make_ride(*ride_window, minute_fields=False)]
+    criteria = {
+        'startingFrom': CITIES[0], 'goingTo': CITIES[1],
+        'preferredStartTime': rider_window[0], 'preferredEndTime': rider_window[1]
+    }
+    assert_parity(rides, criteria)
+
+@pytest.mark.parametrize('criteria', [
+    {'startingFrom': CITIES[0], 'goingTo': CITIES[1]},
+    {'startingFrom': CITIES[0], 'goingTo': CITIES[1], 'preferredStartTime': '09:00'},
+    {'startingFrom': CITIES[0], 'goingTo': CITIES[1], 'preferredEndTime': '09:00'},
+    {'startingFrom': CITIES[0], 'goingTo': CITIES[1], 'preferredStartTime': '', 'preferredEndTime': '09:00'},
+])
+def test_missing_window_side_gives_full_time_score(criteria):
+    rides = [make_ride('08:00', '10:00'), make_ride('23:00', '01:00')]
+    mask, base_scores = batch_score_rides(rides, criteria)
+    assert mask.all()
+    assert_parity(rides, criteria)
+
+@pytest.mark.parametrize('origin, destination, expected', [
+    (CITIES[0], CITIES[1], 1.0),
+    (f'{CITIES[0]} 16801', CITIES[1], 0.95),
+    (f'{CITIES[0]} 16801', f'{CITIES[1]} 02108', 0.9),
+    (CITIES[2], CITIES[1], 0.0),
+])
+def test_location_scores(origin, destination, expected):
+    ride = make_ride('08:00', '10:00', origin=origin, destination=destination)
+    criteria = {'startingFrom': CITIES[0], 'goingTo': CITIES[1]}
+    assert calculate_location_match_score(ride, criteria) == pytest.approx(expected)
+    assert_parity([ride], criteria)
+
+@pytest.mark.parametrize('criteria', [
+    {'startingFrom': CITIES[0]},
+    {'goingTo': CITIES[1]},
+    {}
+])
+def test_location_score_needs_both_sides(criteria):
+    ride = make_ride('08:00', '10:00')
+    assert calculate_location_match_score(ride, criteria) == 0.0
+    assert_parity([ride], criteria)
+
+def test_seat_and_interest_scores():
+    rides = [
+        make_ride('08:00', '10:00', seats=4, remaining=0, interests=4),
+        make_ride('08:00', '10:00', seats=4, remaining=2, interests=2),
+        make_ride('08:00', '10:00', seats=3, remaining=5, interests=12),  # Over-full counters are capped
+        make_ride('08:00', '10:00', seats=1, remaining=1, interests=0)
+    ]
+    del rides[3]['interestCount']
+    assert_parity(rides, {'startingFrom': CITIES[0], 'goingTo': CITIES[1]})
+
+@pytest.mark.parametrize('travel_date', [
+    days_from_today(0), days_from_today(30), days_from_today(45), days_from_today(-3),
+    datetime.now().date() + timedelta(days=10), 'not-a-date', '2026-13-40'
+])
+def test_recency_scores(travel_date):
+    assert_parity([make_ride('08:00', '10:00', travel_date=travel_date)], {'startingFrom': CITIES[0], 'goingTo': CITIES[1]})
+
+def test_mixed_travel_date_types_in_one_batch():
+    rides = [
+        make_ride('08:00', '10:00', travel_date=days_from_today(5)),
+        make_ride('08:00', '10:00', travel_date=date.today() + timedelta(days=2)),
+        make_ride('08:00', '10:00', travel_date='garbage')
+    ]
+    assert_parity(rides, {'startingFrom': CITIES[0], 'goingTo': CITIES[1]})
+
+def test_randomized_parity():
+    rng = random.Random(8)
+    for _ in range(50):
+        assert_parity([random_ride(rng) for _ in range(100)], random_criteria(rng))
+
+def test_rank_ride_ids_matches_scalar_scores(db):
+    rng = random.Random(80)
+    rides = [random_ride(rng) for _ in range(300)]
+    for ride in rides:
+        # Rank from the database as created rides are stored: string dates and minute fields
+        ride['travelDate'] = days_from_today(rng.randint(0, 20))
+        ride.update(get_departure_minutes(ride))
+    db.ride_posts.insert_many(rides)
+
+    for _ in range(20):
+        criteria = random_criteria(rng)
+        route = get_route_keys(criteria)
+        expected = {}
+        for ride in rides:
+            if ride['seatsRemaining'] <= 0:
+                continue
+            if (ride['originCityKey'], ride['destinationCityKey']) != (route['originCityKey'], route['destinationCityKey']):
+                continue
+            if criteria.get('preferredStartTime') and criteria.get('preferredEndTime') and not has_time_overlap(
+                ride['departureStartTime'], ride['departureEndTime'],
+                criteria['preferredStartTime'], criteria['preferredEndTime']
+            ):
+                continue
+            score = calculate_ride_score(ride, criteria)
+            if score > 0.1:
+                expected[str(ride['_id'])] = score
+
+        ranked = rank_ride_ids(criteria)
+        assert {ride_id: score for score, ride_id, _ in ranked} == expected
+        assert [entry[0] for entry in ranked] == sorted(expected.values(), reverse=True)
@@ -0,0 +1,170 @@
+import base64
+import socketserver
+import threading
+from datetime import datetime, timedelta
+import pytest
+from services.email_service.email_outbox import EmailOutbox
+from services.email_service.smtp_pool import smtp_pool
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        self.reply('220 localhost fake SMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif command == 'AUTH':
+                _, username, password = base64.b64decode(line.split()[2]).decode().split('\0')
+                server.logins.append(username)
+                self.reply('235 Authentication successful')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                if server.reject_recipients:
+                    self.reply('451 Try again later')
+                else:
+                    recipients.append(line.split(':', 1)[1].strip('<> '))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline().decode()
+                    if data_line in ('.\r\n', ''):
+                        break
+                    data.append(data_line)
+                server.messages.append({'to': recipients, 'data': ''.join(data)})
+                self.reply('250 Queued')
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.messages = []
+        self.logins = []
+        self.reject_recipients = False
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """A local SMTP stand-in that the email service's SMTP pool connects to"""
+    server = FakeSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setenv('SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(server.server_address[1]))
+    monkeypatch.setenv('SMTP_USE_TLS', 'false')
+    monkeypatch.setenv('SMTP_USERNAME', 'campusshare@example.com')
+    monkeypatch.setenv('SMTP_APP_PASSWORD', 'app-password')
+    monkeypatch.setenv('FROM_EMAIL', 'campusshare@example.com')
+    monkeypatch.setenv('FROM_NAME', 'CampusShare')
+    yield server
+    smtp_pool.close_all()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def outbox(db, monkeypatch):
+    monkeypatch.setenv('EMAIL_MAX_ATTEMPTS', '3')
+    monkeypatch.setenv('EMAIL_BACKOFF_SECONDS', '30')
+    return EmailOutbox()
+
+def make_due(outbox, message_id):
+    outbox.collection.update_one({'_id': message_id}, {'$set': {'nextAttemptAt': datetime.utcnow() - timedelta(seconds=1)}})
+
+def test_sends_pending_message(outbox, smtp_server):
+    message_id = outbox.enqueue('rider@example.com', 'Rider', 'Ride update', '<p>Hello</p>', 'Hello')
+
+    assert outbox.drain() == 1
+
+    message = outbox.collection.find_one({'_id': message_id})
+    assert message['status'] == 'sent'
+    assert message['attempts'] == 1
+    assert 'lockedBy' not in message
+    assert smtp_server.logins == ['campusshare@example.com']
+    assert smtp_server.messages[0]['to'] == ['rider@example.com']
+    assert 'Subject: Ride update' in smtp_server.messages[0]['data']
+
+def test_retries_with_exponential_backoff(outbox, smtp_server):
+    smtp_server.reject_recipients = True
+    message_id = outbox.enqueue('rider@example.com', 'Rider', 'Ride update', '<p>Hello</p>')
+
+    before = datetime.utcnow()
+    assert outbox.drain() == 0
+    message = outbox.collection.find_one({'_id': message_id})
+    assert message['status'] == 'pending'
+    assert message['attempts'] == 1
+    assert message['lastError']
+    assert before + timedelta(seconds=29) <= message['nextAttemptAt'] <= datetime.utcnow() + timedelta(seconds=31)
+
+    # Not due yet, so nothing is claimed
+    assert outbox.claim_next() is None
+
+    make_due(outbox, message_id)
+    before = datetime.utcnow()
+    assert outbox.drain() == 0
+    message = outbox.collection.find_one({'_id': message_id})
+    assert message['attempts'] == 2
+    assert before + timedelta(seconds=59) <= message['nextAttemptAt'] <= datetime.utcnow() + timedelta(seconds=61)
+
+    smtp_server.reject_recipients = False
+    make_due(outbox, message_id)
+    assert outbox.drain() == 1
+    assert outbox.collection.find_one({'_id': message_id})['status'] == 'sent'
+    assert len(smtp_server.messages) == 1
+
+def test_gives_up_after_max_attempts(outbox, smtp_server):
+    smtp_server.reject_recipients = True
+    message_id = outbox.enqueue('rider@example.com', 'Rider', 'Ride update', '<p>Hello</p>')
+
+    for _ in range(outbox.max_attempts):
+        make_due(outbox, message_id)
+        assert outbox.drain() == 0
+
+    message = outbox.collection.find_one({'_id': message_id})
+    assert message['status'] == 'failed'
+    assert message['attempts'] == outbox.max_attempts
+    assert message['lastError']
+    make_due(outbox, message_id)
+    assert outbox.claim_next() is None
+    assert outbox.get_stats()['failed'] == 1
+
+def test_reclaims_message_left_sending_by_crashed_worker(outbox, smtp_server):
+    message_id = outbox.enqueue('rider@example.com', 'Rider', 'Ride update', '<p>Hello</p>')
+    assert outbox.claim_next()['_id'] == message_id
+    outbox.collection.update_one({'_id': message_id}, {'$set': {'lockedAt': datetime.utcnow() - timedelta(seconds=outbox.lock_timeout_seconds + 1)}})
+
+    assert outbox.drain() == 1
+    assert outbox.collection.find_one({'_id': message_id})['attempts'] == 2
+
+def test_first_request_starts_outbox_workers(db, monkeypatch):
+    from app import app
+    from services.email_service.email_outbox import email_outbox
+
+    monkeypatch.setattr(email_outbox, 'enabled', True)
+    monkeypatch.setattr(email_outbox, 'poll_seconds', 0.05)
+    try:
+        assert app.test_client().get('/api/health').status_code == 200
+        assert email_outbox.get_stats()['workers'] == email_outbox.worker_count
+    finally:
+        email_outbox.stop()
@@ -0,0 +1,28 @@
+import pytest
+from services.email_service.template_engine import email_templates
+
+RIDE_DETAILS = {'source': 'State College, PA', 'destination': 'Boston, MA', 'date': '2026-10-20', 'time': '08:00 - 10:00'}
+
+@pytest.mark.parametrize('name, signoff', [
+    ('ride_interest', 'Happy sharing!'),
+    ('interest_removed', 'Keep sharing!'),
+    ('ride_updated', 'Stay updated!'),
+    ('ride_cancelled', 'Keep sharing!')
+])
+def test_text_body_layout(name, signoff):
+    _, text = email_templates.render(
+        name, rider_name='Alex', updated_text='departure time',
+        frontend_url='https://campusshare.example', ride_details=RIDE_DETAILS
+    )
+    assert text.endswith(f'\n\n{signoff}\n\nCampusShare Team')
+    assert 'From: State College, PA\nTo: Boston, MA\nDate: 2026-10-20\nTime: 08:00 - 10:00\n\n' in text
+    assert '\n\n\n' not in text
+
+def test_html_body_is_escaped():
+    html, text = email_templates.render(
+        'ride_interest', rider_name='<b>Alex</b>', frontend_url='https://campusshare.example',
+        ride_details=dict(RIDE_DETAILS, source='<script>')
+    )
+    assert '<b>Alex</b>' not in html and '&lt;b&gt;Alex&lt;/b&gt;' in html
+    assert '&lt;script&gt;' in html
+    assert '<b>Alex</b>' in text
@@ -0,0 +1,122 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from flask import Flask, jsonify
+from pymongo import ASCENDING
+from pymongo.errors import AutoReconnect
+from utils.idempotency import idempotent
+
+@pytest.fixture
+def ride(db):
+    # Mirrors the unique index created by setup_cloud_database
+    db.ride_interests.create_index([('rideId', ASCENDING), ('interestedUserId', ASCENDING)], unique=True)
+    return db.ride_posts.insert_one({
+        'userId': db.users.insert_one({'name': 'Driver', 'email': 'driver@example.com'}).inserted_id,
+        'startingFrom': 'State College, Pennsylvania',
+        'goingTo': 'Boston, Massachusetts',
+        'travelDate': datetime.utcnow().strftime('%Y-%m-%d'),
+        'departureStartTime': '08:00',
+        'departureEndTime': '10:00',
+        'availableSeats': 2,
+        'seatsRemaining': 2,
+        'interestCount': 0,
+        'version': 1,
+        'status': 'active'
+    }).inserted_id
+
+def express_interest(client, token, ride_id, key=None):
+    headers = {'Authorization': f'Bearer {token}'}
+    if key:
+        headers['Idempotency-Key'] = key
+    return client.post(f'/api/rides/{ride_id}/interest', headers=headers)
+
+def counters(db, ride_id):
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    return ride['seatsRemaining'], ride['interestCount']
+
+def test_interest_takes_a_seat_and_notifies_the_driver(client, db, user_token, ride):
+    response = express_interest(client, user_token[1], ride)
+
+    assert response.status_code == 200
+    assert response.get_json()['rideProvider']['name'] == 'Driver'
+    assert db.ride_interests.count_documents({'rideId': ride, 'interestedUserId': user_token[0]}) == 1
+    assert counters(db, ride) == (1, 1)
+    assert db.notifications.count_documents({'type': 'ride_interest'}) == 1
+
+def test_duplicate_interest_is_rejected_by_the_unique_index(client, db, user_token, ride):
+    assert express_interest(client, user_token[1], ride).status_code == 200
+
+    response = express_interest(client, user_token[1], ride)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Already expressed interest'
+    assert db.ride_interests.count_documents({'rideId': ride}) == 1
+    assert counters(db, ride) == (1, 1)
+    assert db.notifications.count_documents({'type': 'ride_interest'}) == 1
+
+def test_failed_reservation_leaves_no_interest_behind(client, db, user_token, ride, monkeypatch):
+    def unreachable(ride_id, user_id):
+        raise AutoReconnect('connection reset')
+
+    monkeypatch.setattr('routes.rides.reserve_seat', unreachable)
+    assert express_interest(client, user_token[1], ride).status_code == 400
+    assert db.ride_interests.count_documents({'rideId': ride}) == 0
+
+    # A retry is not mistaken for a duplicate
+    monkeypatch.undo()
+    assert express_interest(client, user_token[1], ride).status_code == 200
+    assert counters(db, ride) == (1, 1)
+
+def test_full_ride_leaves_no_interest_behind(client, db, user_token, ride):
+    db.ride_posts.update_one({'_id': ride}, {'$set': {'seatsRemaining': 0}})
+
+    assert express_interest(client, user_token[1], ride).status_code == 409
+    assert db.ride_interests.count_documents({'rideId': ride}) == 0
+
+def test_repeated_idempotency_key_replays_the_response(client, db, user_token, ride):
+    first = express_interest(client, user_token[1], ride, key='click-1')
+    replay = express_interest(client, user_token[1], ride, key='click-1')
+
+    assert replay.status_code == first.status_code == 200
+    assert replay.get_json() == first.get_json()
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert counters(db, ride) == (1, 1)
+    assert db.notifications.count_documents({'type': 'ride_interest'}) == 1
+
+def test_idempotency_key_in_flight_answers_409(client, db, user_token, ride):
+    # Claimed by a request that is still running
+    express_interest(client, user_token[1], ride, key='click-1')
+    key_id = f'{user_token[0]}:POST:/api/rides/{ride}/interest:click-1'
+    db.idempotency_keys.update_one({'_id': key_id}, {'$set': {'state': 'pending'}, '$unset': {'status': '', 'body': ''}})
+
+    response = express_interest(client, user_token[1], ride, key='click-1')
+
+    assert response.status_code == 409
+    assert counters(db, ride) == (1, 1)
+
+@pytest.fixture
+def flaky_app(db):
+    """A view that fails with 500, then raises, then succeeds"""
+    app = Flask(__name__)
+    outcomes = [lambda: (jsonify({'error': 'boom'}), 500), lambda: 1 / 0, lambda: (jsonify({'ok': True}), 201)]
+
+    @app.route('/things', methods=['POST'])
+    @idempotent(scope=lambda: 'user-1')
+    def create_thing():
+        return outcomes.pop(0)()
+
+    return app.test_client()
+
+def test_server_errors_are_not_stored(flaky_app, db):
+    headers = {'Idempotency-Key': 'retry-me'}
+
+    assert flaky_app.post('/things', headers=headers).status_code == 500
+    assert db.idempotency_keys.count_documents({}) == 0
+    assert flaky_app.post('/things', headers=headers).status_code == 500  # Raised
+    assert db.idempotency_keys.count_documents({}) == 0
+
+    response = flaky_app.post('/things', headers=headers)
+    assert response.status_code == 201
+    replay = flaky_app.post('/things', headers=headers)
+    assert (replay.status_code, replay.get_json()) == (201, {'ok': True})
@@ -0,0 +1,82 @@
+import csv
+from services.location_service.gazetteer import LocationGazetteer, location_object_id
+from services.location_service.location_service import LocationService
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Zipcode', 'City', 'State Code', 'State'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+def test_csv_fallback_uses_object_ids(db, tmp_path):
+    csv_path = tmp_path / 'locations.csv'
+    write_csv(csv_path, [
+        {'Zipcode': '2108', 'City': 'Boston', 'State Code': 'MA', 'State': 'Massachusetts'},
+        {'Zipcode': '16801', 'City': 'State College', 'State Code': 'PA', 'State': 'Pennsylvania'}
+    ])
+    gazetteer = LocationGazetteer(lambda: db.locations, str(csv_path))
+
+    assert gazetteer.refresh() == 2
+    boston = gazetteer.search('bos')[0]
+    assert boston['_id'] == location_object_id('02108')
+    assert gazetteer.get(boston['_id']) is boston
+
+def test_get_location_by_id_while_serving_csv_fallback(db, tmp_path):
+    csv_path = tmp_path / 'locations.csv'
+    write_csv(csv_path, [{'Zipcode': '16801', 'City': 'State College', 'State Code': 'PA', 'State': 'Pennsylvania'}])
+    service = LocationService()
+    service.gazetteer = LocationGazetteer(lambda: service.locations, str(csv_path))
+
+    found = service.search_locations('state college')[0]
+    location = service.get_location_by_id(found['_id'])
+
+    assert location['zipCode'] == '16801'
+    assert location['_id'] == str(location_object_id('16801'))
+
+def test_get_location_by_id_from_collection(db, tmp_path):
+    location_id = db.locations.insert_one({
+        'zipCode': '02108', 'city': 'Boston', 'state': 'MA', 'stateName': 'Massachusetts'
+    }).inserted_id
+    service = LocationService()
+
+    assert service.get_location_by_id(str(location_id))['city'] == 'Boston'
+
+def keyed_service(tmp_path):
+    csv_path = tmp_path / 'locations.csv'
+    write_csv(csv_path, [
+        {'Zipcode': '16801', 'City': 'State College', 'State Code': 'PA', 'State': 'Pennsylvania'},
+        {'Zipcode': '16803', 'City': 'State College', 'State Code': 'PA', 'State': 'Pennsylvania'},
+        {'Zipcode': '02108', 'City': 'Boston', 'State Code': 'MA', 'State': 'Massachusetts'}
+    ])
+    service = LocationService()
+    service.gazetteer = LocationGazetteer(lambda: service.locations, str(csv_path))
+    return service
+
+def test_state_code_and_name_share_a_city_key(db, tmp_path):
+    service = keyed_service(tmp_path)
+    keys = {
+        service.get_location_key(location)['cityKey']
+        for location in ('State College, PA', 'state college, pennsylvania', 'State College, Pennsylvania 16803')
+    }
+    assert keys == {'state college|pennsylvania'}
+    assert service.get_location_key('State College, PA 16801')['zipCode'] == '16801'
+
+def test_zip_code_is_resolved_first(db, tmp_path):
+    service = keyed_service(tmp_path)
+    assert service.get_location_key('Boston, MA 16801')['cityKey'] == 'state college|pennsylvania'
+
+def test_unknown_places_fall_back_to_parsed_text(db, tmp_path):
+    service = keyed_service(tmp_path)
+    assert service.get_location_key('Springfield, Nowhere')['cityKey'] == 'springfield|nowhere'
+    assert service.get_location_key('somewhere')['cityKey'] == 'somewhere'
+
+def test_backfill_all_rekeys_rides_keyed_from_parsed_text(db):
+    from services.ride_service.ride_matching import backfill_route_keys
+    ride_id = db.ride_posts.insert_one({
+        'startingFrom': 'State College, PA', 'goingTo': 'Boston, Massachusetts 02108',
+        'originCityKey': 'state college|pa', 'destinationCityKey': 'boston|massachusetts'
+    }).inserted_id
+
+    assert backfill_route_keys() == 0
+    assert backfill_route_keys(recompute=True) == 1
+    assert db.ride_posts.find_one({'_id': ride_id})['originCityKey'] == 'state college|pennsylvania'
@@ -0,0 +1,73 @@
+import os
+import runpy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import jwt
+import pytest
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def get_ticket(client, token):
+    response = client.post('/api/notifications/stream-ticket', headers=bearer(token))
+    assert response.status_code == 200
+    return response.get_json()['ticket']
+
+def open_stream(client, **kwargs):
+    response = client.get('/api/notifications/stream', buffered=False, **kwargs)
+    first = next(response.response) if response.status_code == 200 else None
+    response.close()
+    return response.status_code, first
+
+def test_stream_ticket_requires_session(client):
+    assert client.post('/api/notifications/stream-ticket').status_code == 401
+
+def test_stream_accepts_ticket(client, user_token):
+    _, token = user_token
+    status, first = open_stream(client, query_string={'ticket': get_ticket(client, token)})
+    assert status == 200
+    assert first.decode().startswith('retry: ')
+
+def test_stream_accepts_authorization_header(client, user_token):
+    _, token = user_token
+    assert open_stream(client, headers=bearer(token))[0] == 200
+
+def test_stream_rejects_session_token_in_url(client, user_token):
+    _, token = user_token
+    assert open_stream(client, query_string={'token': token})[0] == 401
+    assert open_stream(client, query_string={'ticket': token})[0] == 401
+
+def test_ticket_is_not_a_session_token(client, user_token):
+    _, token = user_token
+    ticket = get_ticket(client, token)
+    assert client.get('/api/notifications/unread-count', headers=bearer(ticket)).status_code == 401
+
+def test_expired_ticket_is_rejected(client, user_token):
+    from app import app
+    user_id, _ = user_token
+    ticket = jwt.encode({
+        'user_id': str(user_id), 'purpose': 'notification-stream',
+        'exp': datetime.utcnow() - timedelta(seconds=1)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    assert open_stream(client, query_string={'ticket': ticket})[0] == 401
+
+@pytest.fixture
+def gunicorn_config(monkeypatch):
+    monkeypatch.setenv('GUNICORN_THREADS', '32')
+    monkeypatch.setenv('GUNICORN_REQUEST_THREADS', '8')
+    monkeypatch.delenv('SSE_MAX_CONNECTIONS', raising=False)
+    config = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+    yield config
+    os.environ.pop('SSE_MAX_CONNECTIONS', None)
+
+def test_gunicorn_config_uses_threaded_workers(gunicorn_config):
+    assert gunicorn_config['worker_class'] == 'gthread'
+    assert gunicorn_config['threads'] == 32
+    assert os.environ['SSE_MAX_CONNECTIONS'] == '24'
+
+def test_gunicorn_refuses_sync_workers(gunicorn_config):
+    on_starting = gunicorn_config['on_starting']
+    with pytest.raises(RuntimeError):
+        on_starting(SimpleNamespace(cfg=SimpleNamespace(worker_class_str='sync', threads=1)))
+    on_starting(SimpleNamespace(cfg=SimpleNamespace(worker_class_str='sync', threads=8)))
+    on_starting(SimpleNamespace(cfg=SimpleNamespace(worker_class_str='gevent', threads=1)))
@@ -0,0 +1,100 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services.user_service.password_hasher import PasswordHasher, PasswordHasherBusy
+
+@pytest.fixture
+def make_hasher(monkeypatch):
+    """Build a PasswordHasher from env, with a thread pool standing in for the process pool"""
+    executors = []
+
+    def build(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        hasher = PasswordHasher()
+        if hasher.workers > 0:
+            hasher._executor = ThreadPoolExecutor(hasher.workers)
+            hasher._pid = os.getpid()
+            executors.append(hasher._executor)
+        return hasher
+
+    yield build
+    for executor in executors:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def test_workers_default_to_cores_per_web_worker(monkeypatch):
+    monkeypatch.delenv('PASSWORD_HASH_WORKERS', raising=False)
+    monkeypatch.delenv('PASSWORD_HASH_MAX_PENDING', raising=False)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    assert PasswordHasher().workers == 2
+    assert PasswordHasher().max_pending == 8
+
+    monkeypatch.setenv('WEB_CONCURRENCY', '16')
+    assert PasswordHasher().workers == 1
+
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    assert PasswordHasher().workers == 8
+
+def test_inline_hash_and_verify(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=0, BCRYPT_ROUNDS=4)
+    hashed = hasher.hash_password('secret123')
+    assert hasher.verify_password('secret123', hashed)
+    assert not hasher.verify_password('wrong', hashed)
+    assert not hasher.needs_rehash(hashed)
+
+def test_saturated_pool_rejects(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_TIMEOUT_SECONDS=5)
+    release = threading.Event()
+    waiter = threading.Thread(target=hasher._run, args=('hash', release.wait))
+    waiter.start()
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher._run('hash', lambda: True)
+        assert hasher.get_stats()['rejected'] == 1
+    finally:
+        release.set()
+        waiter.join()
+    assert hasher._run('hash', lambda: 'ok') == 'ok'
+
+def test_timed_out_running_task_keeps_its_slot(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_TIMEOUT_SECONDS=0.05)
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow():
+        release.wait()
+        finished.set()
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run('hash', slow)
+    assert hasher.get_stats()['timedOut'] == 1
+
+    # Still running in the pool, so its slot is still taken
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run('hash', lambda: True)
+    assert hasher.get_stats()['rejected'] == 1
+
+    release.set()
+    assert finished.wait(5)
+    hasher._executor.submit(lambda: None).result(5)
+    assert hasher._run('hash', lambda: 'ok') == 'ok'
+
+def test_timed_out_queued_task_is_cancelled(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=2, PASSWORD_HASH_TIMEOUT_SECONDS=0.05)
+    release = threading.Event()
+    ran = []
+    blocker = hasher._executor.submit(release.wait)
+
+    # Queued behind the blocker, times out and is dropped before it runs
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run('hash', lambda: ran.append(True))
+
+    release.set()
+    blocker.result(5)
+    hasher._executor.submit(lambda: None).result(5)
+    assert ran == []
+    # Both slots are free again
+    assert hasher._slots.acquire(blocking=False) and hasher._slots.acquire(blocking=False)
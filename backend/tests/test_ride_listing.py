@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+def insert_rides(db, count):
+    now = datetime.utcnow()
+    return {str(ride_id) for ride_id in db.ride_posts.insert_many([{
+        'userId': ObjectId(),
+        'startingFrom': 'State College, Pennsylvania',
+        'goingTo': 'Boston, Massachusetts',
+        'travelDate': (now + timedelta(days=3)).strftime('%Y-%m-%d'),
+        'departureStartTime': '08:00',
+        'departureEndTime': '10:00',
+        'availableSeats': 3,
+        'seatsRemaining': 3,
+        'interestCount': 0,
+        'status': 'active',
+        # Shared timestamps make the _id tiebreak part of every page boundary
+        'createdAt': now - timedelta(minutes=i // 3)
+    } for i in range(count)]).inserted_ids}
+
+def test_following_next_cursor_lists_every_ride_once(client, db, user_token):
+    ride_ids = insert_rides(db, 25)
+    headers = {'Authorization': f'Bearer {user_token[1]}'}
+
+    seen, cursor = [], None
+    while True:
+        query = f'?limit=10&cursor={cursor}' if cursor else '?limit=10'
+        body = client.get(f'/api/rides/{query}', headers=headers).get_json()
+        assert 'total' not in body
+        assert body['count'] == len(body['rides']) <= 10
+        seen.extend(ride['_id'] for ride in body['rides'])
+        cursor = body['nextCursor']
+        assert body['hasMore'] == (cursor is not None)
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 25
+    assert set(seen) == ride_ids
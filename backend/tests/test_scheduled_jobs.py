@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from services.ride_service import reconcile_interest_counts
+from services.scheduler_service import job_scheduler
+
+def test_counter_repairs_are_scheduled():
+    assert {'reconcile_unread_counts', 'reconcile_interest_counts'} <= set(job_scheduler.jobs)
+
+def insert_ride(db, available=3, remaining=3, interests=0):
+    return db.ride_posts.insert_one({
+        'userId': ObjectId(), 'status': 'active', 'availableSeats': available,
+        'seatsRemaining': remaining, 'interestCount': interests
+    }).inserted_id
+
+def add_interests(db, ride_id, count):
+    db.ride_interests.insert_many([{'rideId': ride_id, 'interestedUserId': ObjectId()} for _ in range(count)])
+
+def age_drift(db, ride_id, seconds):
+    db.ride_posts.update_one({'_id': ride_id}, {'$set': {'counterDrift.seenAt': datetime.utcnow() - timedelta(seconds=seconds)}})
+
+def test_immediate_repair(db):
+    ride_id = insert_ride(db, remaining=3, interests=0)
+    add_interests(db, ride_id, 2)
+
+    assert reconcile_interest_counts() == 1
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    assert (ride['interestCount'], ride['seatsRemaining']) == (2, 1)
+
+def test_settled_repair_waits_for_a_second_sighting(db):
+    ride_id = insert_ride(db, remaining=3, interests=0)
+    add_interests(db, ride_id, 2)
+
+    assert reconcile_interest_counts(settle_seconds=300) == 0
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    assert ride['interestCount'] == 0
+    assert ride['counterDrift']['actual'] == 2
+
+    # Seen again too soon
+    assert reconcile_interest_counts(settle_seconds=300) == 0
+
+    age_drift(db, ride_id, 301)
+    assert reconcile_interest_counts(settle_seconds=300) == 1
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    assert (ride['interestCount'], ride['seatsRemaining']) == (2, 1)
+    assert 'counterDrift' not in ride
+
+def test_in_flight_request_is_not_repaired(db):
+    # Interest removal deleted the interest but has not released the seat yet
+    ride_id = insert_ride(db, remaining=1, interests=2)
+    add_interests(db, ride_id, 1)
+    assert reconcile_interest_counts(settle_seconds=300) == 0
+
+    # The request finishes: release_seat gives the seat back
+    db.ride_posts.update_one({'_id': ride_id}, {'$inc': {'seatsRemaining': 1, 'interestCount': -1}})
+    age_drift(db, ride_id, 301)
+
+    assert reconcile_interest_counts(settle_seconds=300) == 0
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    assert (ride['interestCount'], ride['seatsRemaining']) == (1, 2)
+    assert 'counterDrift' not in ride
+
+def test_changed_counters_restart_the_settle_period(db):
+    ride_id = insert_ride(db, remaining=3, interests=0)
+    add_interests(db, ride_id, 2)
+    reconcile_interest_counts(settle_seconds=300)
+
+    db.ride_posts.update_one({'_id': ride_id}, {'$inc': {'seatsRemaining': -1, 'interestCount': 1}})
+    add_interests(db, ride_id, 1)
+    age_drift(db, ride_id, 301)
+
+    assert reconcile_interest_counts(settle_seconds=300) == 0
+    assert db.ride_posts.find_one({'_id': ride_id})['counterDrift']['interestCount'] == 1
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from utils import cache
+from services.ride_service.ride_matching import get_departure_minutes, get_route_keys, search_rides_page
+from services.ride_service.search_cache import RideSearchCache, ride_search_cache
+
+CRITERIA = {'startingFrom': 'State College, Pennsylvania', 'goingTo': 'Boston, Massachusetts', 'travelDate': '2026-10-20'}
+RIDE = dict(CRITERIA, _id='ride')
+
+@pytest.fixture
+def workers(db, monkeypatch):
+    """Two RideSearchCache instances standing in for two gunicorn workers"""
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.delenv('RIDE_SEARCH_CACHE_BACKEND', raising=False)
+    monkeypatch.setattr(cache, '_registry', dict(cache._registry))
+    return RideSearchCache(), RideSearchCache()
+
+def test_defaults_to_memory_without_redis(workers):
+    assert workers[0].stats()['backend'] == 'memory'
+
+def test_defaults_to_redis_when_configured(monkeypatch):
+    monkeypatch.setenv('REDIS_URL', 'redis://localhost:6379/0')
+    monkeypatch.delenv('RIDE_SEARCH_CACHE_BACKEND', raising=False)
+    monkeypatch.setattr(cache, '_registry', dict(cache._registry))
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        # Without the client library the cache falls back to memory
+        assert RideSearchCache().stats()['backend'] == 'memory'
+    else:
+        assert RideSearchCache().backend.name == 'redis'
+
+def test_invalidation_reaches_other_workers(workers):
+    first, second = workers
+    computed = []
+
+    def compute(result):
+        def run():
+            computed.append(result)
+            return result
+        return run
+
+    assert first.get_or_compute(CRITERIA, compute(['v1'])) == ['v1']
+    assert second.get_or_compute(CRITERIA, compute(['v1'])) == ['v1']
+    assert first.get_or_compute(CRITERIA, compute(['stale'])) == ['v1']
+
+    # A ride change handled by the second worker
+    second.invalidate_ride(RIDE)
+
+    assert first.get_or_compute(CRITERIA, compute(['v2'])) == ['v2']
+    assert second.get_or_compute(CRITERIA, compute(['v2'])) == ['v2']
+    assert computed == [['v1'], ['v1'], ['v2'], ['v2']]
+
+def test_invalidation_is_scoped_to_the_route(workers):
+    first, second = workers
+    other_route = dict(CRITERIA, goingTo='New York, New York')
+    first.get_or_compute(other_route, lambda: ['other'])
+
+    second.invalidate_ride(RIDE)
+
+    assert first.get_or_compute(other_route, lambda: ['recomputed']) == ['other']
+
+def test_dateless_searches_are_invalidated_too(workers):
+    first, second = workers
+    dateless = dict(CRITERIA, travelDate=None)
+    first.get_or_compute(dateless, lambda: ['v1'])
+
+    second.invalidate_ride(RIDE)
+
+    assert first.get_or_compute(dateless, lambda: ['v2']) == ['v2']
+
+def insert_rides(db, seats_remaining):
+    ride_search_cache.clear()
+    travel_date = (datetime.now().date() + timedelta(days=3)).strftime('%Y-%m-%d')
+    for seats in seats_remaining:
+        ride = dict(CRITERIA, userId=ObjectId(), travelDate=travel_date, departureStartTime='08:00', departureEndTime='10:00',
+                    availableSeats=5, seatsRemaining=seats, interestCount=0, status='active')
+        ride.update(get_route_keys(ride), **get_departure_minutes(ride))
+        db.ride_posts.insert_one(ride)
+
+def test_spellings_that_score_differently_are_cached_apart(db):
+    insert_rides(db, [3])
+    exact = {'startingFrom': CRITERIA['startingFrom'], 'goingTo': CRITERIA['goingTo']}
+    lowercase = dict(exact, startingFrom=exact['startingFrom'].lower())
+
+    exact_score = search_rides_page(exact)[0][0]['matchScore']
+    # Same city but not a verbatim origin, so it must not reuse the exact search's ranking
+    lowercase_score = search_rides_page(lowercase)[0][0]['matchScore']
+    assert exact_score - lowercase_score == pytest.approx((1.0 - 0.9) / 2 * 0.5)
+    assert search_rides_page(exact)[0][0]['matchScore'] == exact_score
+
+def test_cached_page_drops_rides_that_are_no_longer_bookable(db):
+    insert_rides(db, range(1, 6))
+    criteria = {'startingFrom': CRITERIA['startingFrom'], 'goingTo': CRITERIA['goingTo']}
+
+    rides, total = search_rides_page(criteria, per_page=3)
+    assert (len(rides), total) == (3, 5)
+
+    # Another process fills a listed ride without invalidating this process's ranking
+    db.ride_posts.update_one({'_id': rides[0]['_id']}, {'$set': {'seatsRemaining': 0}})
+
+    refreshed, total = search_rides_page(criteria, per_page=3)
+    assert (len(refreshed), total) == (3, 4)
+    assert rides[0]['_id'] not in [ride['_id'] for ride in refreshed]
@@ -0,0 +1,120 @@
+import os
+import threading
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from scripts import database
+from services.ride_service.seat_reservations import reserve_seat, release_seat
+
+def create_ride(db, seats):
+    return db.ride_posts.insert_one({
+        'userId': ObjectId(),
+        'startingFrom': 'State College, Pennsylvania',
+        'goingTo': 'Boston, Massachusetts',
+        'travelDate': datetime.utcnow().strftime('%Y-%m-%d'),
+        'availableSeats': seats,
+        'seatsRemaining': seats,
+        'interestCount': 0,
+        'version': 1,
+        'status': 'active'
+    }).inserted_id
+
+def counters(db, ride_id):
+    ride = db.ride_posts.find_one({'_id': ride_id})
+    return ride['seatsRemaining'], ride['interestCount']
+
+def test_reservations_count_down_to_a_full_ride(db):
+    ride_id = create_ride(db, 3)
+    results = [reserve_seat(ride_id, ObjectId()) for _ in range(5)]
+
+    assert [ride['seatsRemaining'] for ride in results[:3]] == [2, 1, 0]
+    assert results[3:] == [None, None]
+    assert counters(db, ride_id) == (0, 3)
+
+    assert [release_seat(ride_id)['seatsRemaining'] for _ in range(3)] == [1, 2, 3]
+    assert counters(db, ride_id) == (3, 0)
+
+def test_owner_inactive_and_full_rides_are_refused(db):
+    ride_id = create_ride(db, 1)
+    owner = db.ride_posts.find_one({'_id': ride_id})['userId']
+    assert reserve_seat(ride_id, owner) is None
+
+    assert reserve_seat(ride_id, ObjectId())['seatsRemaining'] == 0
+    assert reserve_seat(ride_id, ObjectId()) is None
+
+    release_seat(ride_id)
+    db.ride_posts.update_one({'_id': ride_id}, {'$set': {'status': 'cancelled'}})
+    assert reserve_seat(ride_id, ObjectId()) is None
+
+def test_release_never_goes_below_zero_interests(db):
+    ride_id = create_ride(db, 2)
+    assert release_seat(ride_id) is None
+    assert counters(db, ride_id) == (2, 0)
+
+# Concurrency needs a real server: mongomock's find_one_and_update is a
+# separate find and update, so racing threads against it proves nothing.
+
+@pytest.fixture
+def live_db(monkeypatch):
+    """A throwaway database on the mongod at TEST_MONGODB_URI behind get_collection"""
+    uri = os.getenv('TEST_MONGODB_URI')
+    if not uri:
+        pytest.skip('set TEST_MONGODB_URI to a disposable mongod to run concurrency tests')
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    name = f'campus-share-test-{ObjectId()}'
+    monkeypatch.setattr(database.connection_manager, 'get_client', lambda: client)
+    monkeypatch.setattr(database, 'DATABASE_NAME', name)
+    yield client[name]
+    client.drop_database(name)
+    client.close()
+
+def race(threads, target):
+    """Start every thread at once so their updates interleave"""
+    start = threading.Barrier(threads)
+    errors = []
+
+    def run():
+        start.wait()
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, errors
+
+@pytest.mark.parametrize('seats, threads', [(1, 20), (3, 50), (10, 40)])
+def test_concurrent_reservations_never_oversell(live_db, seats, threads):
+    for _ in range(5):
+        ride_id = create_ride(live_db, seats)
+        results = []
+        race(threads, lambda: results.append(reserve_seat(ride_id, ObjectId())))
+
+        reserved = [ride for ride in results if ride is not None]
+        assert len(reserved) == seats
+        # Each winner took a different seat and none saw a negative count
+        assert sorted(ride['seatsRemaining'] for ride in reserved) == list(range(seats))
+        assert counters(live_db, ride_id) == (0, seats)
+
+def test_concurrent_reserve_and_release_stay_in_bounds(live_db):
+    seats = 3
+    ride_id = create_ride(live_db, seats)
+    observed = []
+
+    def churn():
+        for _ in range(20):
+            ride = reserve_seat(ride_id, ObjectId())
+            if ride is not None:
+                observed.append(ride['seatsRemaining'])
+                observed.append(release_seat(ride_id)['seatsRemaining'])
+
+    race(10, churn)
+
+    assert observed and all(0 <= remaining <= seats for remaining in observed)
+    assert counters(live_db, ride_id) == (seats, 0)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from bson import ObjectId
+from services.notification_service import create_notification, create_notifications_bulk, get_unread_count, mark_notification_as_read
+
+def insert_notifications(db, user_id, count, read=False):
+    db.notifications.insert_many([{
+        'userId': user_id, 'type': 'ride_update', 'title': 'Ride updated', 'message': 'Ride updated',
+        'relatedId': None, 'read': read, 'createdAt': datetime.utcnow()
+    } for _ in range(count)])
+
+def test_legacy_user_is_seeded_from_notifications(db):
+    user_id = ObjectId()
+    insert_notifications(db, user_id, 3)
+    insert_notifications(db, user_id, 2, read=True)
+
+    assert create_notification(user_id, 'ride_update', 'Ride updated', 'Ride updated')
+
+    assert db.notification_counters.find_one({'_id': user_id}) is None
+    assert get_unread_count(user_id) == 4
+    assert db.notification_counters.find_one({'_id': user_id})['unread'] == 4
+
+def test_existing_counter_is_incremented(db):
+    user_id = ObjectId()
+    insert_notifications(db, user_id, 2)
+    assert get_unread_count(user_id) == 2
+
+    create_notifications_bulk([user_id, user_id], 'ride_update', 'Ride updated', 'Ride updated')
+    assert get_unread_count(user_id) == 4
+
+    notification = db.notifications.find_one({'userId': user_id, 'read': False})
+    mark_notification_as_read(notification['_id'], user_id)
+    assert get_unread_count(user_id) == 3
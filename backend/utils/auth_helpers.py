@@ -3,6 +3,20 @@ from datetime import datetime, timedelta
 from flask import current_app
 from bson import ObjectId
 from scripts.database import get_collection, format_object_id
+from utils.cache import TTLCache
+import os
+import time
+
+# Tickets for endpoints that cannot send an Authorization header (EventSource)
+STREAM_TICKET_PURPOSE = 'notification-stream'
+STREAM_TICKET_TTL_SECONDS = int(os.getenv('STREAM_TICKET_TTL_SECONDS', 60))
+
+# Short-lived cache of verified token -> user_id
+verified_tokens = TTLCache(
+    'auth_tokens',
+    max_size=int(os.getenv('AUTH_CACHE_SIZE', 4096)),
+    ttl_seconds=int(os.getenv('AUTH_CACHE_TTL_SECONDS', 60))
+)
 
 def create_jwt_token(user_id):
     """Create JWT token for user"""
@@ -13,15 +27,52 @@ def create_jwt_token(user_id):
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
+def create_stream_ticket(user_id):
+    """Create a short-lived ticket that only opens the notification stream
+    
+    Tickets travel in the query string and so end up in access logs; unlike
+    the session JWT they expire after STREAM_TICKET_TTL_SECONDS and are
+    rejected everywhere except the stream.
+    """
+    payload = {
+        'user_id': str(user_id),
+        'purpose': STREAM_TICKET_PURPOSE,
+        'exp': datetime.utcnow() + timedelta(seconds=STREAM_TICKET_TTL_SECONDS),
+        'iat': datetime.utcnow()
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def verify_stream_ticket(ticket):
+    """Verify a ticket from create_stream_ticket and return user_id"""
+    try:
+        payload = jwt.decode(ticket, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    return payload['user_id'] if payload.get('purpose') == STREAM_TICKET_PURPOSE else None
+
 def verify_token(token):
-    """Verify JWT token and return user_id"""
+    """Verify JWT token and return user_id
+    
+    Verified tokens are cached briefly, never beyond their own expiry.
+    Single-purpose tickets are not session tokens and are rejected.
+    """
+    user_id = verified_tokens.get(token)
+    if user_id:
+        return user_id
+    
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    if 'purpose' in payload:
+        return None
+    
+    seconds_left = payload['exp'] - time.time() if 'exp' in payload else verified_tokens.ttl_seconds
+    if seconds_left > 0:
+        verified_tokens.set(token, payload['user_id'], ttl_seconds=min(seconds_left, verified_tokens.ttl_seconds))
+    return payload['user_id']
 
 def get_current_user_from_request(request):
     """Get current user from request headers"""
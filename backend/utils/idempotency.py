@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response
+from pymongo.errors import DuplicateKeyError
+from scripts.database import get_collection
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# How long a completed response is replayed, and how long an in-flight claim blocks retries
+RESPONSE_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60))
+PENDING_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_PENDING_TTL_SECONDS', 60))
+
+def _claim(key_id: str):
+    """Claim key_id for this request; returns None when claimed, else the existing record"""
+    keys = get_collection('idempotency_keys')
+    now = datetime.utcnow()
+    pending = {'state': 'pending', 'createdAt': now,
+               'expiresAt': now + timedelta(seconds=PENDING_TTL_SECONDS)}
+    try:
+        keys.insert_one(dict(pending, _id=key_id))
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # A claim whose request died (or a record the TTL monitor has not removed yet) can be retaken
+    if keys.find_one_and_update({'_id': key_id, 'expiresAt': {'$lte': now}}, {'$set': pending}):
+        return None
+    return keys.find_one({'_id': key_id}) or {'state': 'pending'}
+
+def idempotent(scope):
+    """Replay the stored response for repeated requests carrying an Idempotency-Key
+
+    scope() returns the caller's identity (e.g. the user id), or None to
+    skip idempotency, such as for unauthenticated requests. Keys are stored
+    per scope, method and path in the idempotency_keys collection. The
+    first request's response is kept for IDEMPOTENCY_KEY_TTL_SECONDS unless
+    it is a server error; a repeat that arrives while the first is still
+    running gets 409.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            owner = scope() if key and request.method != 'GET' else None
+            if not owner:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            key_id = f'{owner}:{request.method}:{request.path}:{key}'
+            existing = _claim(key_id)
+            if existing is not None:
+                if existing.get('state') != 'completed':
+                    return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+                response = jsonify(existing['body'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response, existing['status']
+
+            keys = get_collection('idempotency_keys')
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                keys.delete_one({'_id': key_id})
+                raise
+
+            if response.status_code >= 500:
+                # Let the client retry a failure for real
+                keys.delete_one({'_id': key_id})
+            else:
+                now = datetime.utcnow()
+                keys.update_one({'_id': key_id}, {'$set': {
+                    'state': 'completed',
+                    'status': response.status_code,
+                    'body': response.get_json(),
+                    'expiresAt': now + timedelta(seconds=RESPONSE_TTL_SECONDS)
+                }})
+            return response
+        return wrapper
+    return decorator
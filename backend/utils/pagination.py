@@ -0,0 +1,51 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+
+def clamp_limit(limit, default: int, maximum: int) -> int:
+    """Parse a page size, falling back to default and capping at maximum"""
+    if limit in (None, ''):
+        return default
+    return max(1, min(int(limit), maximum))
+
+def encode_cursor(document, field: str = 'createdAt') -> str:
+    """Opaque cursor pointing just after document in (field, _id) order"""
+    payload = json.dumps({'t': document[field].isoformat(), 'id': str(document['_id'])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Decode a cursor from encode_cursor into (value, _id); raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_filter(cursor: str, field: str = 'createdAt') -> dict:
+    """Query clause selecting documents after cursor in descending (field, _id) order"""
+    value, last_id = decode_cursor(cursor)
+    return {'$or': [
+        {field: {'$lt': value}},
+        {field: value, '_id': {'$lt': last_id}}
+    ]}
+
+def keyset_page(collection, query: dict, limit: int, field: str = 'createdAt', projection=None):
+    """Fetch one page newest-first; returns (documents, next_cursor or None)
+
+    query should already include keyset_filter(cursor) when paging forward.
+    One extra document is read to know whether another page exists.
+    """
+    page = list(
+        collection.find(query, projection)
+        .sort([(field, -1), ('_id', -1)])
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1], field)
+
+    return page, next_cursor
@@ -184,7 +184,7 @@ export default function RidesPage() {
     if (!token) return
     
     try {
-      const response = await apiService.getRides(token)
+      const response = await apiService.getAllRides(token)
       if (response.error) {
               toast({
         title: "Error",
@@ -128,14 +128,36 @@ class ApiService {
   }
 
   // Rides endpoints
-  async getRides(token: string) {
-    return this.request('/rides/', {
+  // One page of the listing; pass the previous page's nextCursor to get the next one
+  async getRides(token: string, cursor?: string, limit?: number) {
+    const params = new URLSearchParams()
+    if (cursor) params.set('cursor', cursor)
+    if (limit) params.set('limit', limit.toString())
+    const queryString = params.toString() ? `?${params.toString()}` : ''
+    return this.request(`/rides/${queryString}`, {
       headers: {
         Authorization: `Bearer ${token}`,
       },
     })
   }
 
+  // Every active ride, following nextCursor page by page
+  async getAllRides(token: string): Promise<ApiResponse<{ rides: any[]; count: number }>> {
+    const rides: any[] = []
+    let cursor: string | undefined
+    do {
+      const response = await this.getRides(token, cursor, 100)
+      if (response.error) {
+        return { error: response.error }
+      }
+      const page = response.data as { rides?: any[]; nextCursor?: string | null }
+      rides.push(...(page.rides || []))
+      cursor = page.nextCursor || undefined
+    } while (cursor)
+
+    return { data: { rides, count: rides.length } }
+  }
+
   async createRide(token: string, rideData: any) {
     return this.request('/rides/', {
       method: 'POST',